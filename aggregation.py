@@ -0,0 +1,158 @@
+import columnar
+import message_parser
+import parallel
+from columnar import NO_DATE
+from message_parser import METRICS
+
+TOP_N = 10
+
+
+def processed_columns(messages, workers=0, channel_names=None):
+    """Parses messages into report columns, in order; channel_names optionally gives each message's channel.
+
+    Large inputs are parsed in chunks on a process pool. Only the text and URLs go to the
+    workers and the parses come back as plain tuples without the text, which pickle several
+    times faster than the objects and keep the main process's share of the work small.
+    """
+    columns = columnar.MessageColumns(TOP_N)
+    channel_names = channel_names or [""] * len(messages)
+    if not parallel.use_pool(len(messages), workers):
+        for message, channel in zip(messages, channel_names):
+            columns.append_parsed(message, message_parser.parse_message(message.message, message.urls), channel)
+        return columns
+
+    chunks = parallel.chunked([(message.message, message.urls) for message in messages])
+    packed = (parsed for chunk in parallel.map_chunks(_parse_chunk, chunks, workers) for parsed in chunk)
+    for message, channel, (token_name, chart_url, x_com_link, readings) in zip(messages, channel_names, packed):
+        columns.append(message, token_name, chart_url, x_com_link, dict(readings), channel)
+    return columns
+
+
+def _parse_chunk(texts):
+    packed = []
+    for text, urls in texts:
+        parsed = message_parser.parse_message(text, urls)
+        readings = tuple((metric, (reading.value, reading.disparity)) for metric, reading in parsed.metrics.items())
+        packed.append((parsed.token_name, parsed.chart_url, parsed.x_com_link, readings))
+    return packed
+
+
+def build_frame(columns):
+    """Builds one frame over the MessageColumns for the grouped operations.
+
+    The frame's index is the row in columns, which is how dates and text are looked up for
+    the few rows that get displayed. "micros" (nullable) is what the interval maths runs on,
+    and each metric gets found/value/disparity columns.
+    """
+    # pandas takes longer to import than the rest of the app, so only report runs load it
+    import numpy as np
+    import pandas as pd
+
+    micros = np.frombuffer(columns.micros, dtype=np.int64)
+    frame_columns = {
+        "micros": pd.arrays.IntegerArray(micros.copy(), micros == NO_DATE),
+        "token_name": columns.token_name.to_numpy(),
+        "url": columns.url.to_numpy(),
+        "x_com_link": columns.x_com_link.to_numpy(),
+        "views": np.frombuffer(columns.views, dtype=np.int64),
+        "forwards": np.frombuffer(columns.forwards, dtype=np.int64),
+    }
+    for metric in METRICS:
+        frame_columns[f"{metric}_found"] = np.frombuffer(columns.found[metric], dtype=np.bool_)
+        frame_columns[f"{metric}_value"] = np.frombuffer(columns.value[metric], dtype=np.int64)
+        frame_columns[f"{metric}_disparity"] = np.frombuffer(columns.disparity[metric], dtype=np.int64)
+    return pd.DataFrame(frame_columns)
+
+
+def format_avg_time_diff(avg_time_diff):
+    """Formats an average interval in seconds as minutes:seconds."""
+    minutes, seconds = divmod(avg_time_diff, 60)
+    return f"{int(minutes)}:{int(seconds):02d}"
+
+
+def top_n(frame, column):
+    # nlargest keeps the first occurrence on ties, like a stable sort by value descending
+    return frame.nlargest(TOP_N, column, keep="first")
+
+
+def most_recurring_charts(charts):
+    """Top charts by occurrence with their average interval and average metrics.
+
+    Averages are taken across all x.com links for the token/chart, counting only the
+    (token, chart, x.com link) groups that have at least one Likes reading.
+    """
+    keys = ["token_name", "url"]
+    grouped = charts.groupby(keys, sort=False)
+    summary = grouped.agg(count=("micros", "size"), first=("micros", "first"), last=("micros", "last"))
+    # groupby(sort=False) lists groups by first appearance, so a stable sort matches Counter.most_common
+    summary = summary.sort_values("count", ascending=False, kind="stable").head(TOP_N)
+
+    has_likes = charts.groupby(keys + ["x_com_link"], sort=False)["Likes_found"].transform("any")
+    averages = {}
+    for metric in METRICS:
+        readings = charts[charts[f"{metric}_found"] & has_likes]
+        sums = readings.groupby(keys, sort=False)[f"{metric}_value"].agg(["sum", "size"])
+        averages[metric] = sums["sum"] / sums["size"]
+
+    rows = []
+    for (token_name, chart_href), count, first, last in summary[["count", "first", "last"]].itertuples():
+        # The mean of consecutive differences telescopes to (last - first) / (n - 1)
+        avg_time_diff_str = format_avg_time_diff((last - first) / 1e6 / (count - 1)) if count >= 2 else "N/A"
+        metric_averages = [averages[metric].get((token_name, chart_href), 0) for metric in METRICS]
+        rows.append((token_name, chart_href, int(count), avg_time_diff_str) + tuple(f"{average:.2f}" for average in metric_averages))
+    return rows
+
+
+def disparity_table(charts, metric, format_date, columns):
+    """Top (token, chart, x.com link) groups by their largest disparity, dated at its first occurrence."""
+    readings = charts[charts[f"{metric}_found"]]
+    if readings.empty:
+        return []
+    keys = ["token_name", "url", "x_com_link"]
+    peaks = readings.loc[readings.groupby(keys, sort=False)[f"{metric}_disparity"].idxmax()]
+    peaks = peaks.sort_values(f"{metric}_disparity", ascending=False, kind="stable").head(TOP_N)
+    return [
+        (token_name, chart_href, x_com_link, int(disparity), format_date(columns.date(row)))
+        for row, token_name, chart_href, x_com_link, disparity
+        in peaks[keys + [f"{metric}_disparity"]].itertuples()
+    ]
+
+
+def metric_table(charts, metric, format_date, columns):
+    top = top_n(charts, f"{metric}_value")
+    return [
+        (token_name, metric, int(value), format_date(columns.date(row)), chart_href, x_com_link)
+        for row, token_name, value, chart_href, x_com_link
+        in top[["token_name", f"{metric}_value", "url", "x_com_link"]].itertuples()
+    ]
+
+
+def top_messages_frame(frame, column, columns):
+    """The Top Views/Forwards rows, the only ones whose date and message text are materialized."""
+    import pandas as pd
+
+    top = top_n(frame, column)
+    return pd.DataFrame({
+        "date": [columns.date(row) for row in top.index],
+        "token_name": top["token_name"].tolist(),
+        "message_text": [columns.text(row) for row in top.index],
+        "url": top["url"].tolist(),
+        "x_com_link": top["x_com_link"].tolist(),
+        "views": top["views"].tolist(),
+        "forwards": top["forwards"].tolist(),
+    })
+
+
+def compute_report_tables(columns, format_date):
+    """Computes every table prepare_and_save_tables writes from MessageColumns, using grouped operations on one frame."""
+    frame = build_frame(columns)
+    # Only dated messages with a chart link count towards the chart, disparity and metric tables
+    charts = frame[frame["micros"].notna() & (frame["url"] != "")]
+
+    return {
+        "most_recurring_charts": most_recurring_charts(charts),
+        "disparity_tables": {metric: disparity_table(charts, metric, format_date, columns) for metric in METRICS},
+        "metrics_tables": {metric: metric_table(charts, metric, format_date, columns) for metric in METRICS},
+        "top_views": top_messages_frame(frame, "views", columns),
+        "top_forwards": top_messages_frame(frame, "forwards", columns),
+    }
@@ -0,0 +1,87 @@
+"""Startup benchmark: how long `import main` and a cached token search take, and what they load.
+
+Fails (exit code 1) if importing main reads config.json, if it or a token search on stored
+data pulls in pandas, telethon, tqdm, tabulate, the HTTP server or the process pool, or if the median import time goes over the budget.
+
+    python benchmarks/import_time.py [--runs 7] [--budget-ms 250]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "telethon", "tqdm", "openpyxl", "xlsxwriter", "tabulate", "http", "multiprocessing")
+
+# Run in a folder without config.json, so any config I/O at import time fails the import
+IMPORT_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "modules": sorted(name for name in sys.modules if name.split(".")[0] in %r)}))
+""" % (HEAVY_MODULES,)
+
+# A token search answered from the (empty) store, answering Y to "use existing data"
+SEARCH_CHILD = """
+import builtins, contextlib, io, json, sys
+import main
+main.load_config()
+builtins.input = lambda prompt="": "Y"
+with contextlib.redirect_stdout(io.StringIO()):
+    main.search_token_instance("0x0000000000000000000000000000000000000000")
+print(json.dumps({"modules": sorted(name for name in sys.modules if name.split(".")[0] in %r)}))
+""" % (HEAVY_MODULES,)
+
+
+def run_child(code, cwd):
+    env = dict(os.environ, PYTHONPATH=REPO_DIRECTORY, PYTHONDONTWRITEBYTECODE="1")
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise SystemExit(f"child process failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1]), wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=250.0, help="fail if the median import of main takes longer")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as work_directory:
+        import_times = []
+        process_times = []
+        for _ in range(args.runs):
+            result, wall = run_child(IMPORT_CHILD, work_directory)
+            import_times.append(result["seconds"] * 1000)
+            process_times.append(wall * 1000)
+        if result["modules"]:
+            failures.append(f"import main loaded heavy modules: {', '.join(result['modules'])}")
+
+        shutil.copy(os.path.join(REPO_DIRECTORY, "config.json"), work_directory)
+        result, wall = run_child(SEARCH_CHILD, work_directory)
+        if result["modules"]:
+            failures.append(f"a cached token search loaded heavy modules: {', '.join(result['modules'])}")
+
+    import_median = statistics.median(import_times)
+    print(f"import main:       median {import_median:.1f} ms, min {min(import_times):.1f} ms over {args.runs} runs")
+    print(f"interpreter+import: median {statistics.median(process_times):.1f} ms")
+    print(f"cached token search process: {wall * 1000:.1f} ms")
+    if import_median > args.budget_ms:
+        failures.append(f"import main took {import_median:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""Benchmarks the hot paths on synthetic raidboard messages and records the timings over time.
+
+    python benchmarks/run_benchmarks.py --sizes 10k,100k [--only report,search] [--check]
+    python benchmarks/run_benchmarks.py --verify [--windows 20]
+
+Every run appends one line per (size, benchmark) to benchmarks/results.jsonl with the git
+commit, so timings can be compared across changes. --check exits with code 1 when a
+benchmark is slower than its last recorded run by more than --threshold. --verify times
+nothing; it checks that the report built from raw messages and the one merged from hourly
+rollups agree, and exits with code 1 if they don't.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+REPO_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIRECTORY)
+
+import aggregation  # noqa: E402
+import exporters  # noqa: E402
+import main  # noqa: E402
+import message_parser  # noqa: E402
+import message_store  # noqa: E402
+import replay  # noqa: E402
+import rollups  # noqa: E402
+import synthetic  # noqa: E402
+
+RESULTS_FILE = os.path.join(REPO_DIRECTORY, "benchmarks", "results.jsonl")
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+
+class Timer:
+    def __init__(self):
+        self.results = {}
+
+    @contextlib.contextmanager
+    def measure(self, name):
+        started = time.perf_counter()
+        yield
+        self.results[name] = time.perf_counter() - started
+
+
+def run_suite(count, work_directory, groups, fetch_latency=0.0):
+    """Runs the selected benchmark groups on count synthetic messages; returns {benchmark: seconds}."""
+    timer = Timer()
+    records = synthetic.generate_records(count)
+
+    main.load_config(os.path.join(REPO_DIRECTORY, "config.json"))
+    main.store_file = os.path.join(work_directory, f"bench_{count}.db")
+    main.history_file = os.path.join(work_directory, "no_history.json")
+    main.channel_urls = [main.channel_url]
+    main.dataset_directory = ""
+
+    if "parse" in groups:
+        with timer.measure("parse_message"):
+            for record in records:
+                message_parser.parse_message(record.message, record.urls)
+
+    if "json" in groups:
+        history_path = os.path.join(work_directory, "history.json")
+        with timer.measure("json_save"):
+            with open(history_path, "w", encoding="utf-8") as f:
+                json.dump([synthetic.to_dict(record) for record in records], f, ensure_ascii=False, indent=4)
+        with timer.measure("json_load"):
+            with open(history_path, "r", encoding="utf-8") as f:
+                [message_store.MessageRecord.from_dict(message) for message in json.load(f)]
+        os.remove(history_path)
+
+    if "fetch" in groups:
+        # Fetch throughput over the offline replay client, serially and as 4 date shards
+        for name, shards in (("fetch_messages", 1), ("fetch_messages_sharded[4]", 4)):
+            client = replay.ReplayClient(records, latency=fetch_latency)
+            fetch_conn = message_store.open_store(os.path.join(work_directory, f"fetch_{shards}.db"))
+            with contextlib.redirect_stderr(io.StringIO()):
+                with timer.measure(name):
+                    asyncio.run(client.start())
+                    if shards == 1:
+                        asyncio.run(main.fetch_messages(client, "bench", records[0].date, conn=fetch_conn, covered_from=None))
+                    else:
+                        asyncio.run(main.fetch_messages_sharded(client, "bench", records[0].date, shards, conn=fetch_conn))
+            fetch_conn.close()
+
+    conn = main.open_message_store()
+    with timer.measure("store_upsert"):
+        message_store.upsert_messages(conn, records)
+    with timer.measure("store_load"):
+        message_store.load_messages(conn)
+
+    report_tables = None
+    if "report" in groups:
+        captured = {}
+        original_prepare = main.prepare_and_save_tables
+        main.prepare_and_save_tables = lambda tables: captured.update(tables)
+        try:
+            with timer.measure("display_selected_fields"):
+                main.display_selected_fields(records)
+        finally:
+            main.prepare_and_save_tables = original_prepare
+        report_tables = captured
+
+        start_date, end_date = records[0].date, records[-1].date
+        with timer.measure("rollup_report_cold"):
+            rollups.report_tables_from_rollups(conn, start_date, end_date, main.format_date)
+        with timer.measure("rollup_report_warm"):
+            rollups.report_tables_from_rollups(conn, start_date, end_date, main.format_date)
+
+    if "export" in groups:
+        if report_tables is None:
+            report_tables = rollups.report_tables_from_rollups(conn, records[0].date, records[-1].date, main.format_date)
+        for export_format, (_, extension) in exporters.EXPORTERS.items():
+            path = os.path.join(work_directory, f"report.{extension}" if extension else f"report_{export_format}")
+            try:
+                with timer.measure(f"prepare_and_save_tables[{export_format}]"):
+                    exporters.export_report(report_tables, path, export_format, main.format_date)
+            except ImportError as e:
+                print(f"  skipping {export_format} export: {e}")
+
+    if "search" in groups:
+        conns = {"bench": conn}
+        addresses = [message_store.EVM_ADDRESS_PATTERN.search(record.message) or message_store.BASE58_ADDRESS_PATTERN.search(record.message)
+                     for record in records[:20000]]
+        addresses = list(dict.fromkeys(match.group(0) for match in addresses if match))[:300]
+        with contextlib.redirect_stdout(io.StringIO()):
+            with timer.measure("search_token_instance[indexed]"):
+                main.print_token_searches(conns, addresses[:1])
+            with timer.measure("search_token_instance[scan]"):
+                main.print_token_searches(conns, ["Started a raid"])
+            with timer.measure(f"search_watchlist[{len(addresses)}]"):
+                main.print_token_searches(conns, addresses)
+
+    conn.close()
+    return timer.results
+
+
+def comparable_tables(report_tables):
+    """The report tables as plain nested lists, with the top views/forwards frames' dates formatted."""
+    comparable = {}
+    for name, table in report_tables.items():
+        if hasattr(table, "itertuples"):
+            table = [[main.format_date(row[0])] + list(row[1:]) for row in table.itertuples(index=False)]
+        elif isinstance(table, dict):
+            table = {key: [list(row) for row in rows] for key, rows in table.items()}
+        else:
+            table = [list(row) for row in table]
+        comparable[name] = table
+    return comparable
+
+
+def verify_reports(count, work_directory, windows=20, seed=0):
+    """Compares aggregation.compute_report_tables with rollups.report_tables_from_rollups on count synthetic messages.
+
+    Checks the whole history and random windows that start and end mid-hour, then again
+    after re-upserting some messages with new views and forwards. Returns the mismatches.
+    """
+    main.load_config(os.path.join(REPO_DIRECTORY, "config.json"))
+    records = [record for record in synthetic.generate_records(count, seed=seed) if record.date]
+    conn = message_store.open_store(os.path.join(work_directory, f"verify_{count}.db"))
+    message_store.upsert_messages(conn, records)
+    rng = random.Random(seed)
+
+    def window_pairs():
+        yield records[0].date, records[-1].date
+        first, last = records[0].date.timestamp(), records[-1].date.timestamp()
+        for _ in range(windows):
+            start, end = sorted(rng.uniform(first, last) for _ in range(2))
+            yield message_store.from_timestamp(int(start)), message_store.from_timestamp(int(end))
+
+    mismatches = []
+    for phase in ("stored", "re-upserted"):
+        if phase == "re-upserted":
+            # Refetched posts come back with higher counts, enough to reorder the top views/forwards,
+            # and must dirty their hours' rollups
+            most_views = max(record.views for record in records)
+            most_forwards = max(record.forwards for record in records)
+            for record in rng.sample(records, len(records) // 20):
+                record.views += rng.randint(1, most_views)
+                record.forwards += rng.randint(0, most_forwards)
+            message_store.upsert_messages(conn, records)
+        for start_date, end_date in window_pairs():
+            columns = aggregation.processed_columns(message_store.load_messages(conn, start_date, end_date), workers=1)
+            expected = comparable_tables(aggregation.compute_report_tables(columns, main.format_date))
+            actual = comparable_tables(rollups.report_tables_from_rollups(conn, start_date, end_date, main.format_date, workers=1))
+            for name in expected:
+                if actual.get(name) != expected[name]:
+                    mismatches.append(f"{name} differs for {start_date.isoformat()} - {end_date.isoformat()} ({phase})")
+    conn.close()
+    return mismatches
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIRECTORY, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def last_results(path):
+    """The most recent recorded seconds per (size, benchmark)."""
+    previous = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    previous[(result["size"], result["benchmark"])] = result["seconds"]
+    return previous
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10k", help=f"comma separated, from {', '.join(SIZES)} or a plain number")
+    parser.add_argument("--only", default="parse,json,fetch,report,export,search", help="benchmark groups to run")
+    parser.add_argument("--fetch-latency-ms", type=float, default=0.0, help="round trip of each replayed fetch request")
+    parser.add_argument("--results", default=RESULTS_FILE, help="JSON lines file the timings are appended to")
+    parser.add_argument("--no-record", action="store_true", help="don't append this run to the results file")
+    parser.add_argument("--check", action="store_true", help="exit with code 1 on a regression against the last recorded run")
+    parser.add_argument("--threshold", type=float, default=0.25, help="slowdown that counts as a regression (0.25 = 25%%)")
+    parser.add_argument("--verify", action="store_true", help="instead of timing, check the raw-message and rollup reports agree; exit with code 1 if not")
+    parser.add_argument("--windows", type=int, default=20, help="random report windows --verify checks on top of the whole history")
+    args = parser.parse_args()
+
+    if args.verify:
+        mismatches = []
+        for size in args.sizes.split(","):
+            count = SIZES.get(size.lower()) or int(size)
+            with tempfile.TemporaryDirectory() as work_directory:
+                found = verify_reports(count, work_directory, args.windows)
+            print(f"{count} messages: {'report engines agree' if not found else f'{len(found)} mismatches'} over {args.windows + 1} windows, before and after re-upserts")
+            mismatches += found
+        for mismatch in mismatches:
+            print(f"MISMATCH: {mismatch}")
+        sys.exit(1 if mismatches else 0)
+
+    groups = set(args.only.split(","))
+    previous = last_results(args.results)
+    run = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+    }
+
+    records = []
+    regressions = []
+    for size in args.sizes.split(","):
+        count = SIZES.get(size.lower()) or int(size)
+        print(f"\n{count} messages")
+        with tempfile.TemporaryDirectory() as work_directory:
+            results = run_suite(count, work_directory, groups, args.fetch_latency_ms / 1000)
+        for benchmark, seconds in results.items():
+            before = previous.get((count, benchmark))
+            change = f"{(seconds - before) / before:+.0%} vs {before:.3f}s" if before else "first run"
+            print(f"  {benchmark:<36} {seconds:9.3f}s  {change}")
+            if before and seconds > before * (1 + args.threshold):
+                regressions.append(f"{benchmark} at {count}: {seconds:.3f}s vs {before:.3f}s")
+            records.append(dict(run, size=count, benchmark=benchmark, seconds=round(seconds, 6)))
+
+    if not args.no_record:
+        with open(args.results, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
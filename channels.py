@@ -0,0 +1,81 @@
+from collections import Counter
+
+import aggregation
+import message_store
+import watchlist
+
+
+def channel_name(url):
+    """Short name for a channel URL, e.g. "t.me/raidboard" -> "raidboard"."""
+    return url.rstrip("/").rsplit("/", 1)[-1].lstrip("@")
+
+
+def merged_report_tables(conns, start_date, end_date, format_date, workers=0):
+    """Report tables over every channel's messages, plus which channel posted each chart first.
+
+    conns maps channel names to their message stores. Message ids are per channel, so the
+    channels are interleaved by date instead.
+    """
+    tagged = [(message, name) for name, conn in conns.items() for message in message_store.load_messages(conn, start_date, end_date)]
+    tagged.sort(key=lambda item: item[0].date)
+
+    columns = aggregation.processed_columns([message for message, _ in tagged], workers, [name for _, name in tagged])
+    report_tables = aggregation.compute_report_tables(columns, format_date)
+    report_tables["first_shilled"] = first_shilled(columns, format_date)
+    return report_tables
+
+
+def first_shilled(columns, format_date):
+    """(token, chart, first channel, first time, channel count) rows, earliest first, from date-ordered report columns."""
+    firsts = {}
+    channels = {}
+    for row in range(len(columns)):
+        chart_href = columns.url[row]
+        if not chart_href:
+            continue
+        key = (columns.token_name[row], chart_href)
+        channel = columns.channel[row]
+        if key not in firsts:
+            firsts[key] = (channel, columns.date(row))
+        channels.setdefault(key, set()).add(channel)
+    return [
+        (token_name, chart_href, channel, format_date(date), len(channels[(token_name, chart_href)]))
+        for (token_name, chart_href), (channel, date) in firsts.items()
+    ]
+
+
+def merged_token_ranks(conns):
+    """Token ranks by occurrences summed over every channel.
+
+    Ties go to the token first seen earliest in any channel, as a single store orders them by
+    first message; message ids aren't comparable across channels, so dates are used.
+    """
+    occurrences = Counter()
+    first_seen = {}
+    for conn in conns.values():
+        for token_name, (count, first_date) in message_store.load_token_occurrences(conn).items():
+            occurrences[token_name] += count
+            if first_date is not None and (token_name not in first_seen or first_date < first_seen[token_name]):
+                first_seen[token_name] = first_date
+    ranked = sorted(occurrences.items(), key=lambda item: (-item[1], first_seen.get(item[0], float("inf")), item[0]))
+    return {token_name: rank for rank, (token_name, _) in enumerate(ranked, 1)}
+
+
+def search_channels(conns, terms, texts=None):
+    """Returns {term: {channel name: messages}} for every term, searching each channel's store once.
+
+    texts optionally maps channel names to their watchlist.searchable_texts.
+    """
+    texts = texts or {}
+    per_channel = {name: watchlist.search_watchlist(conn, terms, texts.get(name)) for name, conn in conns.items()}
+    return {term: {name: matches[term] for name, matches in per_channel.items()} for term in terms}
+
+
+def first_seen_rows(messages_by_channel, format_date):
+    """(channel, first seen, posts) for every channel that posted the token, earliest first."""
+    firsts = [
+        (name, min(message.date for message in messages), len(messages))
+        for name, messages in messages_by_channel.items() if messages
+    ]
+    firsts.sort(key=lambda row: row[1])
+    return [(name, format_date(date), count) for name, date, count in firsts]
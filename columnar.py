@@ -0,0 +1,117 @@
+import heapq
+from array import array
+from datetime import datetime, timedelta, timezone
+
+import message_parser
+from message_parser import METRICS
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+NO_DATE = -2 ** 63  # micros of a message without a date
+
+
+class StringColumn:
+    """Dictionary-encoded strings: every distinct value is kept once and each row holds its code."""
+
+    __slots__ = ("values", "codes", "index")
+
+    def __init__(self):
+        self.values = []
+        self.codes = array("i")
+        self.index = {}
+
+    def append(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, row):
+        return self.values[self.codes[row]]
+
+    def to_numpy(self):
+        """An object array whose rows all point at the one copy of each value."""
+        import numpy as np
+
+        return np.array(self.values, dtype=object)[np.frombuffer(self.codes, dtype=np.intc)]
+
+
+class MessageColumns:
+    """Parsed messages for the reports, stored column by column.
+
+    Token names, chart links, x.com links and channels are dictionary-encoded, and dates
+    (UTC microseconds), views, forwards and every metric's value and disparity are packed
+    integer arrays, so a message costs a few dozen bytes instead of a dict of strings and
+    objects. Message text is only kept for the rows that can still make the Top Views or Top
+    Forwards tables (the text_rows largest of each so far), which are the only ones shown.
+    """
+
+    __slots__ = ("text_rows", "top_rows", "texts", "micros", "token_name", "url", "x_com_link", "channel", "views", "forwards", "found", "value", "disparity")
+
+    def __init__(self, text_rows=10):
+        self.text_rows = text_rows
+        # Per ranking (views, forwards), a min-heap of the text_rows largest (value, -row); ties go to the earlier row
+        self.top_rows = ([], [])
+        self.texts = {}  # row -> raw message text, for the rows in either heap
+        self.micros = array("q")
+        self.token_name = StringColumn()
+        self.url = StringColumn()
+        self.x_com_link = StringColumn()
+        self.channel = StringColumn()
+        self.views = array("q")
+        self.forwards = array("q")
+        self.found = {metric: bytearray() for metric in METRICS}
+        self.value = {metric: array("q") for metric in METRICS}
+        self.disparity = {metric: array("q") for metric in METRICS}
+
+    def __len__(self):
+        return len(self.micros)
+
+    def append(self, message, token_name, chart_url, x_com_link, readings, channel=""):
+        """Adds one message; readings maps metric names to (value, disparity) for the metric lines the post had."""
+        row = len(self.micros)
+        self.micros.append((message.date - EPOCH) // timedelta(microseconds=1) if message.date else NO_DATE)
+        self.token_name.append(token_name)
+        self.url.append(chart_url)
+        self.x_com_link.append(x_com_link)
+        self.channel.append(channel)
+        self.views.append(int(message.views or 0))
+        self.forwards.append(int(message.forwards or 0))
+        self.keep_text(0, self.views[row], row, message.message)
+        self.keep_text(1, self.forwards[row], row, message.message)
+        for metric in METRICS:
+            reading = readings.get(metric)
+            self.found[metric].append(reading is not None)
+            self.value[metric].append(reading[0] if reading is not None else 0)
+            self.disparity[metric].append(reading[1] if reading is not None else 0)
+
+    def append_parsed(self, message, parsed, channel=""):
+        readings = {metric: (reading.value, reading.disparity) for metric, reading in parsed.metrics.items()}
+        self.append(message, parsed.token_name, parsed.chart_url, parsed.x_com_link, readings, channel)
+
+    def keep_text(self, ranking, value, row, text):
+        top = self.top_rows[ranking]
+        item = (value, -row)
+        if len(top) < self.text_rows:
+            heapq.heappush(top, item)
+        elif item > top[0]:
+            dropped = -heapq.heapreplace(top, item)[1]
+            if all(dropped != -other for rows in self.top_rows for _, other in rows):
+                del self.texts[dropped]
+        else:
+            return
+        self.texts[row] = text
+
+    def date(self, row):
+        return date_of(self.micros[row])
+
+    def text(self, row):
+        """The cleaned message text of a row among the top text_rows by views or forwards."""
+        return message_parser.clean_message_text(self.texts[row])
+
+
+def date_of(micros):
+    """The UTC datetime for a micros value, or None for a message without a date."""
+    if micros is None or micros == NO_DATE:
+        return None
+    return EPOCH + timedelta(microseconds=int(micros))
@@ -0,0 +1,65 @@
+import os
+from datetime import datetime, timezone
+
+import message_parser
+import message_store
+from files import write_atomic
+from message_parser import METRICS
+from message_store import DAY
+
+# One row per stored message. Metrics a post doesn't show are null rather than 0, so
+# notebooks can tell "no reading" from "zero likes".
+DATASET_COLUMNS = (
+    ["id", "date", "token_name", "chart_url", "x_com_link"]
+    + [column for metric in METRICS for column in (metric.lower(), f"{metric.lower()}_delta")]
+    + ["views", "forwards"]
+)
+
+
+def message_rows(messages):
+    rows = []
+    for message in messages:
+        parsed = message_parser.parse_message(message.message, message.urls)
+        row = [message.id, message.date, parsed.token_name, parsed.chart_url, parsed.x_com_link]
+        for metric in METRICS:
+            reading = parsed.metrics.get(metric)
+            row += [reading.value, reading.delta] if reading is not None else [None, None]
+        rows.append(row + [message.views, message.forwards])
+    return rows
+
+
+def partition_path(directory, channel, day):
+    """Hive-style path, so pyarrow/duckdb/polars can prune by channel and day from the path alone."""
+    day_name = datetime.fromtimestamp(day, timezone.utc).strftime("%Y-%m-%d")
+    return os.path.join(directory, f"channel={channel}", f"day={day_name}", "messages.parquet")
+
+
+def write_partition(path, messages):
+    import pandas as pd
+
+    frame = pd.DataFrame(message_rows(messages), columns=DATASET_COLUMNS)
+    for column in DATASET_COLUMNS[5:]:
+        frame[column] = frame[column].astype("Int64")
+    frame["date"] = pd.to_datetime(frame["date"], utc=True)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_atomic(path, frame.to_parquet(None, index=False))
+
+
+def sync_dataset(conn, directory, channel):
+    """Rewrites the day partitions that stored messages were added to or refreshed in since the last sync.
+
+    A day's file is replaced as a whole, so refetched views and forwards land in the dataset
+    too; untouched days are never read or written again. Returns the number of days written.
+    """
+    days = [day for (day,) in conn.execute("SELECT day FROM dataset_days ORDER BY day")]
+    for day in days:
+        messages = message_store.load_messages_between(conn, day, day + DAY)
+        path = partition_path(directory, channel, day)
+        if messages:
+            write_partition(path, messages)
+        elif os.path.exists(path):
+            os.remove(path)
+        with conn:
+            conn.execute("DELETE FROM dataset_days WHERE day = ?", (day,))
+    return len(days)
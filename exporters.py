@@ -0,0 +1,121 @@
+import csv
+import os
+
+MOST_RECURRING_HEADERS = ["Token", "📈 Chart Link", "Occur.", "Avg Time (m:s)", "❤️", "🔄", "💬", "🔖"]
+FIRST_SHILLED_HEADERS = ["Token", "📈 Chart Link", "First Channel", "First Seen", "Channels"]
+METRIC_HEADERS = ["Token", "Metric", "Value", "Date", "📈 Chart Link", "x.com Link"]
+TOP_MESSAGE_COLUMNS = ["date", "token_name", "message_text", "url", "x_com_link", "views", "forwards"]
+TOP_MESSAGE_HEADERS = ["date", "token_name", "message_text", "url", "x.com Link", "views", "forwards"]
+TOKEN_CHART_HEADERS = ["Rank", "Token", "📈 Chart Link", "Occur.", "Avg Time (m:s)", "❤️", "🔄", "💬", "🔖"]
+X_COM_HEADERS = ["Token", "🔗 x.com Link", "Time"]
+
+
+class Sheet:
+    """One sheet of the report: named tables of (headers, rows), stacked with blank rows between them."""
+
+    __slots__ = ("name", "tables", "gap")
+
+    def __init__(self, name, tables, gap=0):
+        self.name = name
+        self.tables = tables  # [(table name, headers, rows)]
+        self.gap = gap
+
+    def column_widths(self):
+        """Widest value (or header) per column across every table on the sheet, plus padding."""
+        widths = []
+        for _, headers, rows in self.tables:
+            for row in [headers] + rows:
+                for i, value in enumerate(row):
+                    width = len(str(value)) + 2
+                    if i == len(widths):
+                        widths.append(width)
+                    elif width > widths[i]:
+                        widths[i] = width
+        return widths
+
+
+def report_sheets(report_tables, format_date):
+    """Lays the report tables out in the sheets and order the Excel report has always used."""
+    sheets = [Sheet("Most Recurring Charts", [("Most Recurring Charts", MOST_RECURRING_HEADERS, list(report_tables["most_recurring_charts"]))])]
+
+    disparity_tables = [
+        (f"Top 10 {metric} Disparities", ["Token", "📈 Chart Link", "x.com Link", f"Max {metric} Disparity", "Date"], list(data))
+        for metric, data in report_tables["disparity_tables"].items() if data  # Skip if no data
+    ]
+    sheets.append(Sheet("Top 10 Disparities", disparity_tables, gap=2))
+
+    metrics_tables = [(f"Top {metric}", METRIC_HEADERS, list(data)) for metric, data in report_tables["metrics_tables"].items()]
+    sheets.append(Sheet("Top Metrics Instances", metrics_tables, gap=2))
+
+    top_tables = []
+    for table_name, frame in (("Top Views", report_tables["top_views"]), ("Top Forwards", report_tables["top_forwards"])):
+        frame = frame[TOP_MESSAGE_COLUMNS].assign(date=frame["date"].map(format_date))
+        top_tables.append((table_name, TOP_MESSAGE_HEADERS, frame.astype(object).values.tolist()))
+    sheets.append(Sheet("Top Views & Forwards", top_tables, gap=1))
+
+    # Merged multi-channel reports also say which channel posted each chart first
+    if "first_shilled" in report_tables:
+        sheets.append(Sheet("First Shilled", [("First Shilled", FIRST_SHILLED_HEADERS, list(report_tables["first_shilled"]))]))
+    return sheets
+
+
+def export_xlsx(sheets, path):
+    """Streams the sheets to one workbook with xlsxwriter, holding only the current row in memory."""
+    import xlsxwriter
+
+    # Cells are written as plain values, never turned into links or formulas
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "strings_to_urls": False, "strings_to_formulas": False})
+    # The same header style pandas' to_excel used
+    header_format = workbook.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+    try:
+        for sheet in sheets:
+            worksheet = workbook.add_worksheet(sheet.name)
+            for i, width in enumerate(sheet.column_widths()):
+                worksheet.set_column(i, i, width)
+            row = 0
+            for _, headers, rows in sheet.tables:
+                worksheet.write_row(row, 0, headers, header_format)
+                for values in rows:
+                    row += 1
+                    worksheet.write_row(row, 0, values)
+                row += 1 + sheet.gap
+    finally:
+        workbook.close()
+
+
+def export_csv(sheets, path):
+    """Writes every table to its own CSV file in the folder at path."""
+    os.makedirs(path, exist_ok=True)
+    for sheet in sheets:
+        for table_name, headers, rows in sheet.tables:
+            # utf-8-sig so Excel shows the emoji headers properly
+            with open(os.path.join(path, f"{table_name}.csv"), "w", newline="", encoding="utf-8-sig") as f:
+                writer = csv.writer(f)
+                writer.writerow(headers)
+                writer.writerows(rows)
+
+
+def export_parquet(sheets, path):
+    """Writes every table to its own Parquet file in the folder at path."""
+    import pandas as pd
+
+    os.makedirs(path, exist_ok=True)
+    for sheet in sheets:
+        for table_name, headers, rows in sheet.tables:
+            frame = pd.DataFrame(rows, columns=headers)
+            frame.to_parquet(os.path.join(path, f"{table_name}.parquet"), index=False)
+
+
+# export_format in config.json -> (writer, file extension, or None for a folder of files)
+EXPORTERS = {
+    "xlsx": (export_xlsx, "xlsx"),
+    "csv": (export_csv, None),
+    "parquet": (export_parquet, None),
+}
+# What a saved report of each format is called in the prompts
+FORMAT_NAMES = {"xlsx": "Excel file", "csv": "CSV folder", "parquet": "Parquet folder"}
+
+
+def export_report(report_tables, path, export_format, format_date):
+    writer, _ = EXPORTERS[export_format]
+    writer(report_sheets(report_tables, format_date), path)
@@ -0,0 +1,16 @@
+import os
+
+
+def write_atomic(path, data):
+    """Writes text (as UTF-8) or bytes beside path and swaps the file in whole.
+
+    Readers (a scraper, another tool, a dataset query) never see a half-written file.
+    """
+    temp_path = f"{path}.tmp"
+    if isinstance(data, str):
+        with open(temp_path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(data)
+    else:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+    os.replace(temp_path, path)
@@ -0,0 +1,133 @@
+import json
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from files import write_atomic
+
+
+class RunStats:
+    """Per-stage timers and counters for one run of the tool.
+
+    Stages are named blocks of work (fetch, parse, aggregation, export, search) timed with
+    stage(); counters are running totals such as messages fetched or flood-wait seconds.
+    Setting profile_stage runs that one stage under cProfile and dumps the stats to profile_file.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.stage_seconds = {}
+        self.stage_calls = {}
+        self.counters = {}
+        self.profile_stage = ""
+        self.profile_file = ""
+
+    @contextmanager
+    def stage(self, name):
+        profiler = None
+        if name == self.profile_stage:
+            import cProfile
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+            if profiler is not None:
+                profiler.disable()
+                path = self.profile_file or f"{name}.prof"
+                profiler.dump_stats(path)
+                print(f"Profile of the {name} stage saved to {path} (python -m pstats {path})")
+
+    def record(self, name, seconds):
+        self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+        self.stage_calls[name] = self.stage_calls.get(name, 0) + 1
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def summary(self):
+        summary = {
+            "started": datetime.fromtimestamp(self.started, timezone.utc).isoformat(timespec="seconds"),
+            "duration_seconds": round(time.time() - self.started, 3),
+            "peak_memory_bytes": peak_memory_bytes(),
+            "stages": {
+                name: {"seconds": round(seconds, 6), "calls": self.stage_calls[name]}
+                for name, seconds in self.stage_seconds.items()
+            },
+            "counters": dict(self.counters),
+        }
+        # The rates asked about most, derived from the stages and counters above
+        fetch_seconds = self.stage_seconds.get("fetch")
+        if fetch_seconds and "messages_fetched" in self.counters:
+            summary["fetch_messages_per_second"] = round(self.counters["messages_fetched"] / fetch_seconds, 1)
+        if self.counters.get("messages_parsed") and "parse" in self.stage_seconds:
+            summary["parse_seconds_per_message"] = self.stage_seconds["parse"] / self.counters["messages_parsed"]
+        return summary
+
+    def prometheus_text(self):
+        """The summary in Prometheus' text exposition format, e.g. for node_exporter's textfile collector."""
+        lines = [
+            "# TYPE shillbot_stage_seconds gauge",
+            *(f'shillbot_stage_seconds{{stage="{name}"}} {seconds}' for name, seconds in self.stage_seconds.items()),
+            "# TYPE shillbot_stage_calls gauge",
+            *(f'shillbot_stage_calls{{stage="{name}"}} {calls}' for name, calls in self.stage_calls.items()),
+        ]
+        for name, value in self.counters.items():
+            lines += [f"# TYPE shillbot_{name} gauge", f"shillbot_{name} {value}"]
+        peak = peak_memory_bytes()
+        if peak is not None:
+            lines += ["# TYPE shillbot_peak_memory_bytes gauge", f"shillbot_peak_memory_bytes {peak}"]
+        lines += ["# TYPE shillbot_run_duration_seconds gauge", f"shillbot_run_duration_seconds {time.time() - self.started}"]
+        return "\n".join(lines) + "\n"
+
+
+def peak_memory_bytes():
+    """Peak resident memory of this process so far, or None where it can't be read."""
+    try:
+        import resource
+    except ImportError:
+        return windows_peak_working_set()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def windows_peak_working_set():
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                    "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage",
+                )
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    except (AttributeError, OSError):
+        return None
+
+
+def write_run_outputs(stats, summary_file, prometheus_file):
+    """Writes the JSON run summary ("-" prints it) and the Prometheus text file, whichever are set."""
+    if summary_file == "-":
+        print(json.dumps(stats.summary(), indent=2))
+    elif summary_file:
+        write_atomic(summary_file, json.dumps(stats.summary(), indent=2))
+    if prometheus_file:
+        write_atomic(prometheus_file, stats.prometheus_text())
+
+
+# The one run this process is making; every module records into it
+stats = RunStats()
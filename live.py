@@ -0,0 +1,169 @@
+import heapq
+import json
+import time
+from datetime import datetime
+
+import message_parser
+import trending
+from files import write_atomic
+from aggregation import TOP_N, format_avg_time_diff
+from message_parser import METRICS
+
+
+class LiveAggregates:
+    """Report state kept up to date one post at a time, for following raidboard live.
+
+    Each add() is a single parse plus dictionary and heap updates; the tables are only
+    assembled when a snapshot is taken. The tables follow the same rules as the Shillbot
+    report, so a snapshot matches a report over the same posts.
+    """
+
+    def __init__(self, format_date, trending_tokens=None):
+        self.format_date = format_date
+        # Sliding-window shill counts, usually seeded with the stored posts from before today
+        self.trending = trending_tokens if trending_tokens is not None else trending.TrendingTokens()
+        self.message_count = 0
+        # (token, chart) -> occurrences, first id, first and last date
+        self.charts = {}
+        # (token, chart, x.com link) -> per-metric [count, sum], peak disparity and first reading id
+        self.groups = {}
+        # Per metric, a min-heap of the TOP_N largest (value, -id, row) readings
+        self.top_metrics = {metric: [] for metric in METRICS}
+        # Per metric, group key -> peak disparity for the TOP_N groups with the highest peaks
+        self.top_peaks = {metric: {} for metric in METRICS}
+
+    def add(self, message):
+        """Folds one message into the state and returns notices for anything worth shouting about."""
+        self.message_count += 1
+        parsed = message_parser.parse_message(message.message, message.urls)
+        if not parsed.chart_url or message.date is None:
+            return []
+
+        notices = []
+        chart_key = (parsed.token_name, parsed.chart_url)
+        chart = self.charts.get(chart_key)
+        if chart is None:
+            chart = self.charts[chart_key] = {"count": 0, "first_id": message.id, "first": message.date, "last": message.date}
+            notices.append(f"New chart: {parsed.token_name} {parsed.chart_url} at {self.format_date(message.date)}")
+        chart["count"] += 1
+        chart["last"] = message.date
+        self.trending.add(chart_key, message.date.timestamp())
+
+        group_key = chart_key + (parsed.x_com_link,)
+        group = self.groups.get(group_key)
+        if group is None:
+            group = self.groups[group_key] = {
+                metric: {"count": 0, "sum": 0, "peak": None, "peak_date": None, "first_id": None} for metric in METRICS
+            }
+
+        for metric in METRICS:
+            reading = parsed.metrics.get(metric)
+            value = reading.value if reading is not None else 0
+            row = (parsed.token_name, metric, value, message.date, parsed.chart_url, parsed.x_com_link)
+            top = self.top_metrics[metric]
+            if len(top) < TOP_N:
+                heapq.heappush(top, (value, -message.id, row))
+            elif (value, -message.id) > top[0][:2]:
+                heapq.heapreplace(top, (value, -message.id, row))
+
+            if reading is None:
+                continue
+            stats = group[metric]
+            stats["count"] += 1
+            stats["sum"] += reading.value
+            if stats["first_id"] is None:
+                stats["first_id"] = message.id
+            # The peak is dated at the first post that reached it
+            if stats["peak"] is None or reading.disparity > stats["peak"]:
+                stats["peak"] = reading.disparity
+                stats["peak_date"] = message.date
+                if self.record_peak(metric, group_key, reading.disparity) < TOP_N and reading.disparity > 0:
+                    notices.append(
+                        f"{metric} disparity spike: {parsed.token_name} {reading.disparity} "
+                        f"({parsed.x_com_link or parsed.chart_url}) at {self.format_date(message.date)}"
+                    )
+        return notices
+
+    def record_peak(self, metric, group_key, peak):
+        """Notes a group's new peak and returns how many other groups have peaked at least as high.
+
+        Only the TOP_N highest peaks are kept. Every group left out peaked no higher than the
+        lowest kept one, so the count is exact whenever it is below TOP_N, which is all the
+        caller asks; otherwise it is TOP_N or more.
+        """
+        top = self.top_peaks[metric]
+        rank = sum(1 for key, other in top.items() if key != group_key and other >= peak)
+        if group_key in top or len(top) < TOP_N:
+            top[group_key] = peak
+        else:
+            lowest = min(top, key=top.get)
+            if peak > top[lowest]:
+                del top[lowest]
+                top[group_key] = peak
+        return rank
+
+    def report_tables(self):
+        """The recurring-chart, disparity and top-metric tables, in the Shillbot report's row layout."""
+        # Averages count only the x.com groups with at least one Likes reading, as the report does
+        totals = {}
+        for (token_name, chart_href, _), group in self.groups.items():
+            if not group["Likes"]["count"]:
+                continue
+            chart_totals = totals.setdefault((token_name, chart_href), {metric: [0, 0] for metric in METRICS})
+            for metric in METRICS:
+                chart_totals[metric][0] += group[metric]["sum"]
+                chart_totals[metric][1] += group[metric]["count"]
+
+        charts = sorted(self.charts.items(), key=lambda item: (-item[1]["count"], item[1]["first_id"]))[:TOP_N]
+        most_recurring_charts = []
+        for chart_key, chart in charts:
+            count = chart["count"]
+            # The mean of consecutive differences telescopes to (last - first) / (n - 1)
+            avg_time_diff_str = format_avg_time_diff((chart["last"] - chart["first"]).total_seconds() / (count - 1)) if count >= 2 else "N/A"
+            chart_totals = totals.get(chart_key)
+            averages = [chart_totals[metric][0] / chart_totals[metric][1] if chart_totals and chart_totals[metric][1] else 0 for metric in METRICS]
+            most_recurring_charts.append(chart_key + (count, avg_time_diff_str) + tuple(f"{average:.2f}" for average in averages))
+
+        disparity_tables = {}
+        for metric in METRICS:
+            peaks = [(group_key, group[metric]) for group_key, group in self.groups.items() if group[metric]["count"]]
+            peaks.sort(key=lambda item: (-item[1]["peak"], item[1]["first_id"]))
+            disparity_tables[metric] = [
+                group_key + (stats["peak"], self.format_date(stats["peak_date"])) for group_key, stats in peaks[:TOP_N]
+            ]
+
+        metrics_tables = {}
+        for metric in METRICS:
+            rows = [row for _, _, row in sorted(self.top_metrics[metric], reverse=True)]
+            metrics_tables[metric] = [
+                (token_name, metric, value, self.format_date(date), chart_href, x_com_link)
+                for token_name, metric, value, date, chart_href, x_com_link in rows
+            ]
+
+        return {
+            "most_recurring_charts": most_recurring_charts,
+            "disparity_tables": disparity_tables,
+            "metrics_tables": metrics_tables,
+            # Ranked against the clock, so a token that goes quiet cools down between posts
+            "trending": trending.trending_tables(self.trending, now=time.time()),
+        }
+
+
+def print_tables(report_tables, message_count):
+    from tabulate import tabulate
+
+    print(f"\n=== Live at {datetime.now().strftime('%H:%M:%S')} ({message_count} posts) ===")
+    print(tabulate(report_tables["most_recurring_charts"], ["Token", "📈 Chart Link", "Occur.", "Avg Time (m:s)", "❤️", "🔄", "💬", "🔖"], tablefmt="fancy_grid"))
+    data = report_tables["disparity_tables"]["Likes"]
+    if data:
+        print(tabulate(data, ["Token", "📈 Chart Link", "x.com Link", "Max Likes Disparity", "Date"], tablefmt="fancy_grid"))
+    data = report_tables["metrics_tables"]["Likes"]
+    if data:
+        print(tabulate(data, ["Token", "Metric", "Value", "Date", "📈 Chart Link", "x.com Link"], tablefmt="fancy_grid"))
+    trending.print_trending({window: rows for window, rows in report_tables["trending"].items() if window != "24h"})
+
+
+def write_snapshot(path, report_tables, message_count):
+    """Writes the tables as JSON, replacing the file in one step so readers never see half a snapshot."""
+    snapshot = dict(report_tables, taken_at=datetime.now().isoformat(), message_count=message_count)
+    write_atomic(path, json.dumps(snapshot, ensure_ascii=False, indent=2))
@@ -1,40 +1,75 @@
 import json
-import re
-from datetime import datetime, timedelta, timezone
+import argparse
+import sys
+from datetime import datetime, timedelta
 from collections import defaultdict, Counter
-from tabulate import tabulate
-import pytz
-from telethon import TelegramClient
-from telethon.errors import SessionPasswordNeededError, FloodWaitError, RPCError
-import pandas as pd
 import os
 import subprocess
 import asyncio
-from tqdm.asyncio import tqdm
 from getpass import getpass
-
-# Load configuration from config.json
-with open('config.json', 'r') as config_file:
-    config = json.load(config_file)
-
-api_id = config["api_id"]
-api_hash = config["api_hash"]
-phone = config["phone"]
-password = config["password"]
-channel_url = config["channel_url"]
-timezone_config = config["timezone"]
-output_directory = config.get("output_directory", os.getcwd())
-
-# Define the timezone based on the configuration
-local_tz = pytz.timezone(timezone_config)
-end_date = datetime.now(pytz.utc)
-
-
-def parse_metric(text):
-    try:
-        return int(text.split()[0].replace("(", "").replace("+", ""))
-    except (ValueError, IndexError):
-        return 0
+import message_store
+import message_parser
+import aggregation
+import rollups
+import watchlist
+import channels
+import exporters
+import dataset
+from instrumentation import stats, write_run_outputs
+
+fetch_page_size = 100
+checkpoint_every = 500  # Messages fetched between checkpoints to the message store
+pipeline_queue_batches = 4  # Fetched batches waiting to be stored before fetching pauses
+
+channel_entities = {}  # Resolved channels by URL, so every job in a run shares one get_entity call
+
+
+def load_config(path='config.json'):
+    """Loads config.json into the module settings. main() calls this once, so importing main reads nothing."""
+    global config, api_id, api_hash, phone, password, channel_url, channel_urls, timezone_config, output_directory
+    global store_file, history_file, fetch_state_file, fetch_shards, max_requests_in_flight, max_fetch_retries
+    global export_format, report_extension, dataset_directory, live_refresh_seconds, live_snapshot_file, replay_config, local_tz, end_date
+    global run_summary_file, prometheus_file, parse_workers, server_host, server_port
+    import pytz
+
+    with open(path, 'r') as config_file:
+        config = json.load(config_file)
+
+    api_id = config["api_id"]
+    api_hash = config["api_hash"]
+    phone = config["phone"]
+    password = config["password"]
+    channel_url = config["channel_url"]
+    channel_urls = config.get("channels") or [channel_url]
+    timezone_config = config["timezone"]
+    output_directory = config.get("output_directory", os.getcwd())
+    store_file = config.get("store_file", "raidboard_messages.db")
+    history_file = config.get("history_file", "raidboard_chat_history.json")
+    fetch_state_file = config.get("fetch_state_file", "fetch_state.json")
+    fetch_shards = config.get("fetch_shards", 1)
+    max_requests_in_flight = config.get("max_requests_in_flight", 4)
+    max_fetch_retries = config.get("max_fetch_retries", 5)
+    export_format = config.get("export_format", "xlsx")  # xlsx, csv or parquet
+    if export_format not in exporters.EXPORTERS:
+        raise ValueError(f"Unknown export_format '{export_format}' in {path}, use one of: {', '.join(exporters.EXPORTERS)}")
+    report_extension = exporters.EXPORTERS[export_format][1]
+    dataset_directory = config.get("dataset_directory", "")  # Parquet dataset of every parsed message, off when empty
+    live_refresh_seconds = config.get("live_refresh_seconds", 10)
+    live_snapshot_file = config.get("live_snapshot_file", "")
+    # With a "source" set, fetches are served offline by replay.ReplayClient instead of Telegram
+    replay_config = config.get("replay") or {}
+    # Run instrumentation: a JSON summary ("-" prints it), a Prometheus text file, and one stage under cProfile
+    run_summary_file = config.get("run_summary_file", "")
+    prometheus_file = config.get("prometheus_file", "")
+    stats.profile_stage = config.get("profile_stage", "")
+    stats.profile_file = config.get("profile_file", "")
+    server_host = config.get("server_host", "127.0.0.1")
+    server_port = config.get("server_port", 8765)
+    parse_workers = config.get("parse_workers", 0)  # Processes for parsing large histories, 0 for one per core, 1 to stay serial
+
+    # Define the timezone based on the configuration
+    local_tz = pytz.timezone(timezone_config)
+    end_date = datetime.now(pytz.utc)
 
 
 def calculate_avg_time_diffs(timestamps):
@@ -50,40 +85,30 @@ def calculate_avg_time_diffs(timestamps):
     avg_time_diff = sum(time_diffs) / len(time_diffs)
 
     # Convert the average time difference back into a readable format (e.g., minutes and seconds)
-    minutes, seconds = divmod(avg_time_diff, 60)
-    return f"{int(minutes)}:{int(seconds):02d}"
+    return aggregation.format_avg_time_diff(avg_time_diff)
 
 
 def search_token_in_message(message, token_id):
     """Searches for a token ID within a message text or associated URLs."""
-    message_text = message.get("message", "")
+    message_text = message.message
 
     # Check in the message text
     if token_id.lower() in message_text.lower():
         return True
 
     # Check in the URLs in the message's entities
-    if "entities" in message:
-        for entity in message["entities"]:
-            if entity.get("_") == "MessageEntityTextUrl":
-                url = entity.get("url", "")
-                if token_id.lower() in url.lower():
-                    return True
+    for url in message.urls:
+        if token_id.lower() in url.lower():
+            return True
 
     return False
 
 
-def convert_and_format_date_utc_plus_1(date_str):
-    if not date_str:
-        return "Invalid date"
-    try:
-        utc_time = datetime.fromisoformat(date_str)
-        target_tz = timezone(timedelta(hours=1))
-        localized_time = utc_time.astimezone(target_tz)
-        formatted_date = localized_time.strftime("%H:%M:%S %d/%m/%Y")
-        return formatted_date
-    except ValueError:
+def format_date(date):
+    """Formats an aware datetime for display in the configured timezone."""
+    if not isinstance(date, datetime):
         return "Invalid date"
+    return date.astimezone(local_tz).strftime("%H:%M:%S %d/%m/%Y")
 
 
 def get_start_date():
@@ -110,248 +135,37 @@ def get_start_date():
     return start_date
 
 
-def serialize_message(message_dict):
-    """Recursively converts datetime objects in the message to strings."""
-    for key, value in message_dict.items():
-        if isinstance(value, datetime):
-            message_dict[key] = value.isoformat()
-        elif isinstance(value, dict):
-            serialize_message(value)
-    return message_dict
-
-
-def clean_message_text(message_text):
-    patterns_to_remove = [
-        r"📈 Chart   ⏫ Trending   ✳️ Events",
-        r"🐬 \| D\.RAIDBOARD #[0-9]+ \| [0-9]+⚡️",
-        r"[🐳🐬⚡️]"
-    ]
-    for pattern in patterns_to_remove:
-        message_text = re.sub(pattern, '', message_text).strip()
-    return message_text
-
-
-def extract_token_name(message_text):
-    # Try multiple patterns to extract token name
-    patterns = [
-        r'^(.*?)\s(?:Started|Just)',          # Matches "TokenName Started..." or "TokenName Just..."
-        r'^🚀\s*(.*?)\s*🚀',                   # Matches "🚀 TokenName 🚀"
-        r'^Token:\s*(\S+)',                   # Matches "Token: TokenName"
-        r'Launching\s*(\S+)',                 # Matches "Launching TokenName"
-        r'^New Shill:\s*(\S+)',               # Matches "New Shill: TokenName"
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, message_text, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
-    return "Unknown Token"
-
-
-def calculate_disparity(text):
-    try:
-        a = int(text.split()[0])
-        x = int(text.split("(+")[1].replace(")", ""))
-        return a - x
-    except (ValueError, IndexError):
-        return 0
-
-
 def display_selected_fields(messages, filter_date=None):
-    processed_data = {"messages": []}
-
+    selected = []
     for message in messages:
-        date = message.get("date", "N/A")
-        date_utc_plus_1 = convert_and_format_date_utc_plus_1(date)
         if filter_date:
-            try:
-                message_date = datetime.strptime(date_utc_plus_1, "%H:%M:%S %d/%m/%Y")
-            except ValueError:
+            if message.date is None:
                 continue  # Skip messages with invalid dates
-            if message_date.date() != filter_date:
+            if message.date.astimezone(local_tz).date() != filter_date:
                 continue
+        selected.append(message)
 
-        message_text = clean_message_text(message.get("message", "N/A"))
-        token_name = extract_token_name(message_text)
-        url = ""
-        x_com_link = ""  # Initialize x.com link
-
-        # Extract links from entities
-        for entity in message.get("entities", []):
-            if entity.get("_") == "MessageEntityTextUrl":
-                entity_url = entity.get("url", "")
-                if entity_url.startswith("https://dexscreener.com/"):
-                    url = entity_url
-                elif entity_url.startswith("https://x.com/"):
-                    x_com_link = entity_url  # Extract x.com link
-
-        # Extract x.com link from message text if not found in entities
-        if not x_com_link:
-            x_com_match = re.search(r'https://x\.com/\S+', message_text)
-            if x_com_match:
-                x_com_link = x_com_match.group(0)
-
-        # **Updated Extraction of Chart Links from Message Text**
-        # If chart link not found in entities, search in message text
-        if not url:
-            chart_match = re.search(r'https://dexscreener\.com/\S+', message_text)
-            if chart_match:
-                url = chart_match.group(0)
-
-        views = message.get("views", "0")
-        forwards = message.get("forwards", "0")
-
-        processed_data["messages"].append({
-            "date": date_utc_plus_1,
-            "token_name": token_name,
-            "message_text": message_text,
-            "url": url,
-            "x_com_link": x_com_link,  # Add x.com link to processed data
-            "views": views,
-            "forwards": forwards
-        })
+    # Parsed into compact report columns, on every core when there are enough messages to be worth it
+    with stats.stage("parse"):
+        processed_data = {"messages": aggregation.processed_columns(selected, parse_workers)}
+    stats.count("messages_parsed", len(selected))
 
     process_messages(processed_data)
 
 
 def process_messages(processed_data):
-    chart_counter = Counter()
-    chart_timestamps = defaultdict(list)
-    likes_data = defaultdict(list)
-    retweets_data = defaultdict(list)
-    replies_data = defaultdict(list)
-    bookmarks_data = defaultdict(list)
-    disparity_data = defaultdict(lambda: defaultdict(list))
-    disparity_dates = defaultdict(lambda: defaultdict(list))
-    top_metrics_data = defaultdict(list)
+    # Every table is computed on one columnar frame of the processed messages
+    with stats.stage("aggregation"):
+        report_tables = aggregation.compute_report_tables(processed_data["messages"], format_date)
+    prepare_and_save_tables(report_tables)
 
-    for message in processed_data["messages"]:
-        date = message.get("date", "")
-        try:
-            datetime_obj = datetime.strptime(date, "%H:%M:%S %d/%m/%Y")
-        except ValueError:
-            continue  # Skip messages with invalid dates
-        message_text = message["message_text"]
-
-        token_name = message["token_name"]
-        chart_href = message["url"]
-        x_com_link = message.get("x_com_link", "")
-        likes_text = retweets_text = replies_text = bookmarks_text = ""
-
-        found_likes = found_retweets = found_replies = found_bookmarks = False
-        for text_item in message_text.split('\n'):
-            if " Likes: " in text_item:
-                likes_text = text_item.split(" Likes: ")[-1]
-                found_likes = True
-            elif " Retweets: " in text_item:
-                retweets_text = text_item.split(" Retweets: ")[-1]
-                found_retweets = True
-            elif " Replies: " in text_item:
-                replies_text = text_item.split(" Replies: ")[-1]
-                found_replies = True
-            elif " Bookmarks: " in text_item:
-                bookmarks_text = text_item.split(" Bookmarks: ")[-1]
-                found_bookmarks = True
-
-        if chart_href:
-            key = (token_name, chart_href)  # **Exclude x_com_link from key for Most Recurring Charts**
-            chart_counter[key] += 1
-            chart_timestamps[key].append(datetime_obj)
-
-            # Update data collections using key with x_com_link included
-            detailed_key = (token_name, chart_href, x_com_link)
-            if found_likes:
-                likes_data[detailed_key].append(parse_metric(likes_text))
-                disparity = calculate_disparity(likes_text)
-                disparity_data['Likes'][detailed_key].append(disparity)
-                disparity_dates['Likes'][detailed_key].append(date)
-            if found_retweets:
-                retweets_data[detailed_key].append(parse_metric(retweets_text))
-                disparity = calculate_disparity(retweets_text)
-                disparity_data['Retweets'][detailed_key].append(disparity)
-                disparity_dates['Retweets'][detailed_key].append(date)
-            if found_replies:
-                replies_data[detailed_key].append(parse_metric(replies_text))
-                disparity = calculate_disparity(replies_text)
-                disparity_data['Replies'][detailed_key].append(disparity)
-                disparity_dates['Replies'][detailed_key].append(date)
-            if found_bookmarks:
-                bookmarks_data[detailed_key].append(parse_metric(bookmarks_text))
-                disparity = calculate_disparity(bookmarks_text)
-                disparity_data['Bookmarks'][detailed_key].append(disparity)
-                disparity_dates['Bookmarks'][detailed_key].append(date)
-
-            top_metrics_data['Likes'].append((token_name, "Likes", parse_metric(likes_text), date, chart_href, x_com_link))
-            top_metrics_data['Retweets'].append((token_name, "Retweets", parse_metric(retweets_text), date, chart_href, x_com_link))
-            top_metrics_data['Replies'].append((token_name, "Replies", parse_metric(replies_text), date, chart_href, x_com_link))
-            top_metrics_data['Bookmarks'].append((token_name, "Bookmarks", parse_metric(bookmarks_text), date, chart_href, x_com_link))
-
-    prepare_and_save_tables(processed_data, chart_counter, chart_timestamps, likes_data, retweets_data, replies_data, bookmarks_data, disparity_data, disparity_dates, top_metrics_data)
-
-
-def prepare_and_save_tables(processed_data, chart_counter, chart_timestamps, likes_data, retweets_data, replies_data, bookmarks_data, disparity_data, disparity_dates, top_metrics_data):
-    disparity_tables = {}
-    for metric in ['Likes', 'Retweets', 'Replies', 'Bookmarks']:
-        popping_table_data = []
-        for key, disparities in disparity_data[metric].items():
-            token_name, chart_href, x_com_link = key
-            if disparities:
-                max_disparity = max(disparities)
-                max_disparity_index = disparities.index(max_disparity)
-                disparity_date = disparity_dates[metric][key][max_disparity_index]
-            else:
-                max_disparity = 0
-                disparity_date = "N/A"
-            popping_table_data.append((token_name, chart_href, x_com_link, max_disparity, disparity_date))
-
-        popping_table_data.sort(key=lambda x: x[3], reverse=True)
-        disparity_tables[metric] = popping_table_data[:10]
-
-    metrics_tables = {}
-    for metric in ['Likes', 'Retweets', 'Replies', 'Bookmarks']:
-        top_metrics_data[metric].sort(key=lambda x: x[2], reverse=True)
-        metrics_tables[metric] = top_metrics_data[metric][:10]
-
-    most_recurring_charts = []
-    for key, count in chart_counter.most_common(10):
-        token_name, chart_href = key
-        avg_time_diff_str = calculate_avg_time_diffs(chart_timestamps[key]) or "N/A"
-
-        # Collect metrics data across all x_com_links for the same token_name and chart_href
-        likes_list = []
-        retweets_list = []
-        replies_list = []
-        bookmarks_list = []
-        for detailed_key in likes_data.keys():
-            if detailed_key[0] == token_name and detailed_key[1] == chart_href:
-                likes_list.extend(likes_data[detailed_key])
-                retweets_list.extend(retweets_data.get(detailed_key, []))
-                replies_list.extend(replies_data.get(detailed_key, []))
-                bookmarks_list.extend(bookmarks_data.get(detailed_key, []))
-
-        avg_likes = sum(likes_list) / len(likes_list) if likes_list else 0
-        avg_retweets = sum(retweets_list) / len(retweets_list) if retweets_list else 0
-        avg_replies = sum(replies_list) / len(replies_list) if replies_list else 0
-        avg_bookmarks = sum(bookmarks_list) / len(bookmarks_list) if bookmarks_list else 0
-
-        most_recurring_charts.append((token_name, chart_href, count, avg_time_diff_str, f"{avg_likes:.2f}", f"{avg_retweets:.2f}", f"{avg_replies:.2f}", f"{avg_bookmarks:.2f}"))
-
-    # Ensure 'views' and 'forwards' are integers and sort accordingly
-    for message in processed_data["messages"]:
-        try:
-            message["views"] = int(message["views"])
-        except ValueError:
-            message["views"] = 0
-        try:
-            message["forwards"] = int(message["forwards"])
-        except ValueError:
-            message["forwards"] = 0
 
-    top_views = sorted(processed_data["messages"], key=lambda x: x["views"], reverse=True)[:10]
-    top_forwards = sorted(processed_data["messages"], key=lambda x: x["forwards"], reverse=True)[:10]
+def prepare_and_save_tables(report_tables):
+    report_name = exporters.FORMAT_NAMES[export_format]
+    article = "an" if report_name[0] in "AEIOU" else "a"
+    save_tables = input(f"\nDo you want to save the tables to {article} {report_name}? (y/n): ").strip().lower()
 
-    save_to_excel = input("\nDo you want to save the tables to an Excel file? (y/n): ").strip().lower()
-
-    if save_to_excel == "y":
+    if save_tables == "y":
         # Ensure the output directory exists
         if not os.path.exists(output_directory):
             os.makedirs(output_directory)
@@ -361,80 +175,20 @@ def prepare_and_save_tables(processed_data, chart_counter, chart_timestamps, lik
         if use_date_name == "y":
             current_date = datetime.now().strftime("%d.%m.%Y")
             file_name_base = f"{current_date}"
-            file_path = generate_versioned_filename(file_name_base, output_directory)
+            file_path = generate_versioned_filename(file_name_base, output_directory, report_extension)
         else:
-            file_name = input("Enter the Excel file name (without extension): ").strip()
+            file_name = input(f"Enter the {report_name} name (without extension): ").strip()
             if not file_name:
                 file_name_base = datetime.now().strftime("%d.%m.%Y")
-                file_path = generate_versioned_filename(file_name_base, output_directory)
+                file_path = generate_versioned_filename(file_name_base, output_directory, report_extension)
             else:
-                file_path = generate_versioned_filename(file_name, output_directory)
-
-        with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-            # Writing Most Recurring Charts table as the first sheet
-            # Exclude x.com Link from this sheet
-            df_recurring_charts = pd.DataFrame(most_recurring_charts, columns=["Token", "📈 Chart Link", "Occur.", "Avg Time (m:s)", "❤️", "🔄", "💬", "🔖"])
-            df_recurring_charts.to_excel(writer, sheet_name="Most Recurring Charts", index=False)
-
-            worksheet = writer.sheets["Most Recurring Charts"]
-            for i, col in enumerate(df_recurring_charts.columns):
-                max_len = max(df_recurring_charts[col].astype(str).map(len).max(), len(col)) + 2
-                worksheet.column_dimensions[chr(65 + i)].width = max_len
-
-            # Writing Top 10 Disparity tables for all metrics in one sheet
-            row = 0
-            for metric, data in disparity_tables.items():
-                if not data:  # Skip if no data
-                    continue
-                df = pd.DataFrame(data, columns=["Token", "📈 Chart Link", "x.com Link", f"Max {metric} Disparity", "Date"])
-                df.to_excel(writer, sheet_name="Top 10 Disparities", index=False, startrow=row)
-
-                worksheet = writer.sheets["Top 10 Disparities"]
-                for i, col in enumerate(df.columns):
-                    max_len = max(df[col].astype(str).map(len).max(), len(col)) + 2
-                    worksheet.column_dimensions[chr(65 + i)].width = max_len
-                row += len(df) + 3  # Adding space between tables
-
-            # Writing Top Metrics Instances for all metrics in one sheet
-            row = 0
-            for metric, data in metrics_tables.items():
-                df = pd.DataFrame(data, columns=["Token", "Metric", "Value", "Date", "📈 Chart Link", "x.com Link"])
-                df.to_excel(writer, sheet_name="Top Metrics Instances", index=False, startrow=row)
-
-                worksheet = writer.sheets["Top Metrics Instances"]
-                for i, col in enumerate(df.columns):
-                    max_len = max(df[col].astype(str).map(len).max(), len(col)) + 2
-                    worksheet.column_dimensions[chr(65 + i)].width = max_len
-                row += len(df) + 3  # Adding space between tables
-
-            # Writing Top Views and Forwards in a new sheet
-            df_top_views = pd.DataFrame(top_views)
-            df_top_forwards = pd.DataFrame(top_forwards)
-
-            # Add x.com link to the DataFrames
-            df_top_views['x.com Link'] = df_top_views['x_com_link']
-            df_top_forwards['x.com Link'] = df_top_forwards['x_com_link']
-
-            # Select columns to display
-            df_top_views = df_top_views[["date", "token_name", "message_text", "url", "x.com Link", "views", "forwards"]]
-            df_top_forwards = df_top_forwards[["date", "token_name", "message_text", "url", "x.com Link", "views", "forwards"]]
-
-            # Write the tables to the sheet
-            df_top_views.to_excel(writer, sheet_name="Top Views & Forwards", index=False, startrow=0)
-
-            df_top_forwards.to_excel(writer, sheet_name="Top Views & Forwards", index=False, startrow=len(df_top_views) + 2)
-
-            worksheet = writer.sheets["Top Views & Forwards"]
-            for i, col in enumerate(df_top_views.columns):
-                max_len_views = max(df_top_views[col].astype(str).map(len).max(), len(col)) + 2
-                max_len_forwards = max(df_top_forwards[col].astype(str).map(len).max(), len(col)) + 2
-                max_len = max(max_len_views, max_len_forwards)
-                column_letter = chr(65 + i)
-                worksheet.column_dimensions[column_letter].width = max_len
+                file_path = generate_versioned_filename(file_name, output_directory, report_extension)
+
+        save_report(report_tables, file_path)
 
         print(f"\nThe tables have been saved to {file_path}")
 
-        open_file = input("Do you want to open the Excel file now? (y/n): ").strip().lower()
+        open_file = input(f"Do you want to open the {report_name} now? (y/n): ").strip().lower()
         if open_file == "y":
             try:
                 if os.name == 'nt':  # For Windows
@@ -447,10 +201,16 @@ def prepare_and_save_tables(processed_data, chart_counter, chart_timestamps, lik
         print("\nThe tables were not saved.")
 
 
+def save_report(report_tables, file_path):
+    # Written by the backend export_format selects: a streamed xlsx workbook, or a folder of CSV or Parquet files
+    with stats.stage("export"):
+        exporters.export_report(report_tables, file_path, export_format, format_date)
+
+
 def generate_versioned_filename(base_name, directory, extension="xlsx"):
     version = 1
     while True:
-        versioned_name = f"{base_name} V{version}.{extension}"
+        versioned_name = f"{base_name} V{version}.{extension}" if extension else f"{base_name} V{version}"
         file_path = os.path.join(directory, versioned_name)
         if not os.path.exists(file_path):
             return file_path
@@ -470,28 +230,332 @@ def is_valid_date(date_str):
         return False
 
 
-async def fetch_messages(client, channel, start_date):
-    messages = []
-    try:
-        async for message in tqdm(client.iter_messages(channel, reverse=True), desc="Fetching messages"):
-            # Ensure we only capture messages from the start_date onwards
-            if message.date < start_date:
-                continue
-            if message.date > end_date:
+def channel_store_file(url):
+    # channel_url keeps the original store file, every other channel gets its own beside it
+    if url == channel_url:
+        return store_file
+    return os.path.join(os.path.dirname(store_file), f"{channels.channel_name(url)}_messages.db")
+
+
+def open_message_store(url=None):
+    """Opens a channel's local message store, importing an existing raidboard_chat_history.json on first use."""
+    url = url or channel_url
+    conn = message_store.open_store(channel_store_file(url))
+    if url == channel_url:
+        imported = message_store.import_json_history(conn, history_file, fetch_state_file)
+        if imported:
+            print(f"Imported {imported} messages from {history_file} into {store_file}")
+    return conn
+
+
+def open_channel_stores(urls):
+    return {channels.channel_name(url): open_message_store(url) for url in urls}
+
+
+def close_channel_stores(conns):
+    for conn in conns.values():
+        conn.close()
+
+
+def checkpoint_messages(conn, messages, covered_from):
+    """Saves fetched messages and moves the high-water mark to the last of them."""
+    if not messages:
+        return
+    message_store.upsert_messages(conn, messages)
+    message_store.save_fetch_state(conn, {
+        "covered_from": covered_from,
+        "last_message_id": messages[-1].id,
+        "last_message_date": messages[-1].date.isoformat(),
+    })
+
+
+def store_batch(conn, messages, covered_from):
+    """Stores one fetched batch, moves the checkpoint and rolls up the hours the batch completed."""
+    checkpoint_messages(conn, messages, covered_from)
+    # The batch's last hour may still be filling up, a later batch or the report rolls it up
+    last_hour = message_store.to_timestamp(messages[-1].date) // message_store.HOUR * message_store.HOUR
+    rollups.refresh_rollups(conn, workers=1, before=last_hour)
+
+
+async def store_fetched(queue, store):
+    """Pipeline consumer: runs store(batch) in a worker thread for each queued batch until None arrives.
+
+    The parsing, SQLite writes and rollups overlap with the next pages downloading instead of
+    stalling the event loop.
+    """
+    error = None
+    while True:
+        batch = await queue.get()
+        if batch is None:
+            break
+        if error is None:
+            try:
+                await asyncio.to_thread(store, batch)
+            except Exception as e:
+                error = e  # Keep draining, so the fetch never waits on a queue nobody empties
+    if error is not None:
+        raise error
+
+
+def retry_delay(attempt):
+    """Exponential backoff between fetch retries: 2s, 4s, 8s... capped at 5 minutes."""
+    return min(2 ** attempt, 300)
+
+
+async def reconnect(client):
+    if not client.is_connected():
+        await client.connect()
+
+
+async def fetch_messages(client, channel, start_date, min_id=0, conn=None, covered_from=None):
+    """Fetches messages oldest first and returns how many arrived.
+
+    Every checkpoint_every messages go as a batch onto a bounded queue, which store_fetched
+    stores, checkpoints and rolls up while the next pages download; only the queued batches
+    are held in memory. Flood waits are waited out and disconnects/RPC errors retried with
+    backoff, resuming after the last message received instead of starting over.
+    """
+    from telethon.errors import FloodWaitError, RPCError
+    from tqdm.asyncio import tqdm
+
+    fetched = 0
+    pending = []
+    attempt = 0
+    queue = asyncio.Queue(maxsize=pipeline_queue_batches)
+    consumer = None
+    if conn is not None:
+        consumer = asyncio.create_task(store_fetched(queue, lambda batch: store_batch(conn, batch, covered_from)))
+    with tqdm(desc="Fetching messages") as progress:
+        while True:
+            try:
+                # Let the server skip the history we don't need: min_id resumes right after the last
+                # message we already have, otherwise offset_date starts the walk at start_date
+                async for message in client.iter_messages(channel, reverse=True, offset_date=start_date, min_id=min_id):
+                    # Ensure we only capture messages from the start_date onwards
+                    if message.date < start_date:
+                        continue
+                    if message.date > end_date:
+                        break  # Messages arrive oldest first, so nothing after this is in range
+
+                    # Keep only the fields the reports use rather than Telethon's whole object graph
+                    pending.append(message_store.MessageRecord.from_telethon(message))
+                    fetched += 1
+                    min_id = message.id
+                    attempt = 0
+                    progress.update(1)
+                    if len(pending) >= checkpoint_every:
+                        if consumer is not None:
+                            await queue.put(pending)  # Waits while the store falls behind
+                        pending = []
+                break
+            except FloodWaitError as e:
+                print(f"Flood wait of {e.seconds}s, resuming after message {min_id}...")
+                stats.count("flood_waits")
+                stats.count("flood_wait_seconds", e.seconds)
+                await asyncio.sleep(e.seconds)
+            except (RPCError, ConnectionError, asyncio.TimeoutError) as e:
+                attempt += 1
+                stats.count("fetch_retries")
+                if attempt > max_fetch_retries:
+                    print(f"An error occurred: {e}. Giving up after {max_fetch_retries} retries, run again to resume.")
+                    break
+                delay = retry_delay(attempt)
+                print(f"An error occurred: {e}. Retrying in {delay}s ({attempt}/{max_fetch_retries})...")
+                await asyncio.sleep(delay)
+                try:
+                    await reconnect(client)
+                except (ConnectionError, OSError) as e:
+                    print(f"Unable to reconnect: {e}")
+            except Exception as e:
+                print(f"An unexpected error occurred: {e}")
+                break
+
+    if consumer is not None:
+        if pending:
+            await queue.put(pending)
+        await queue.put(None)
+        await consumer
+    stats.count("messages_fetched", fetched)
+    return fetched
+
+
+class FloodWaitScheduler:
+    """Gates every request the fetch shards make so one flood wait pauses all of them.
+
+    Telegram's flood limits apply to the account, not to a single request stream, so when
+    any shard is told to wait, the others hold off too instead of tripping the limit again.
+    """
+
+    def __init__(self, max_in_flight):
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.resume_at = 0.0
+
+    async def request(self, make_request):
+        from telethon.errors import FloodWaitError
+
+        loop = asyncio.get_running_loop()
+        while True:
+            delay = self.resume_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
                 continue
+            async with self.semaphore:
+                if self.resume_at > loop.time():
+                    continue  # Another shard hit a flood wait while we were queued
+                try:
+                    return await make_request()
+                except FloodWaitError as e:
+                    print(f"Flood wait of {e.seconds}s, pausing all fetch shards...")
+                    stats.count("flood_waits")
+                    stats.count("flood_wait_seconds", e.seconds)
+                    self.resume_at = max(self.resume_at, loop.time() + e.seconds)
+
+
+class ShardCheckpoints:
+    """The store side of a sharded fetch: stores pages and moves the high-water mark as shards finish.
+
+    Shards finish in any order, but the mark only covers the run of finished shards from
+    the first one on, so a run that is killed part way resumes after the last fully stored
+    shard rather than downloading everything again.
+    """
+
+    def __init__(self, conn, covered_from, shard_count):
+        self.conn = conn
+        self.covered_from = covered_from
+        self.finished = [False] * shard_count
+        self.newest = [None] * shard_count  # Per shard, its newest message once it finished
+        self.checkpointed = 0  # How many shards from the first are covered by the saved mark
+
+    def store(self, item):
+        """store_fetched's store: a list is a page of messages, (shard index, newest message) a finished shard."""
+        if isinstance(item, list):
+            message_store.upsert_messages(self.conn, item)
+            return
+        index, newest = item
+        self.finished[index] = True
+        self.newest[index] = newest
+        mark = None
+        # Every page a shard queued went in before its marker, so a finished shard is fully stored
+        while self.checkpointed < len(self.finished) and self.finished[self.checkpointed]:
+            mark = self.newest[self.checkpointed] or mark
+            self.checkpointed += 1
+        if mark is not None:
+            message_store.save_fetch_state(self.conn, {
+                "covered_from": self.covered_from,
+                "last_message_id": mark.id,
+                "last_message_date": mark.date.isoformat(),
+            })
+
+
+def split_date_range(start_date, end_date, shards):
+    step = (end_date - start_date) / shards
+    bounds = [start_date + step * i for i in range(shards)] + [end_date]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+async def fetch_shard(client, channel, shard_start, shard_end, scheduler, progress, queue=None, index=0):
+    """Pages through [shard_start, shard_end) oldest first. Returns (newest message or None, message count, completed).
+
+    Each page goes onto the store queue as it arrives, followed by (index, newest message)
+    once the shard is complete. Failed pages are retried with backoff.
+    """
+    from telethon.errors import RPCError
+
+    newest = None
+    fetched = 0
+    last_id = 0
+    attempt = 0
+    while True:
+        if last_id:
+            page_options = {"min_id": last_id}
+        else:
+            # Start a second early, boundary messages are filtered below
+            page_options = {"offset_date": shard_start - timedelta(seconds=1)}
+        try:
+            page = await scheduler.request(
+                lambda: client.get_messages(channel, limit=fetch_page_size, reverse=True, **page_options)
+            )
+        except (RPCError, ConnectionError, asyncio.TimeoutError) as e:
+            attempt += 1
+            stats.count("fetch_retries")
+            if attempt > max_fetch_retries:
+                print(f"An error occurred while fetching {shard_start.isoformat()} - {shard_end.isoformat()}: {e}")
+                return newest, fetched, False
+            await asyncio.sleep(retry_delay(attempt))
+            try:
+                await reconnect(client)
+            except (ConnectionError, OSError):
+                pass
+            continue
+        attempt = 0
+
+        page_messages = []
+        done = len(page) < fetch_page_size
+        for message in page:
+            if message.date >= shard_end:
+                done = True
+                break
+            if message.date >= shard_start:
+                page_messages.append(message_store.MessageRecord.from_telethon(message))
+        if page_messages:
+            newest = page_messages[-1]
+            if queue is not None:
+                await queue.put(page_messages)
+        fetched += len(page_messages)
+        progress.update(len(page_messages))
+        stats.count("messages_fetched", len(page_messages))
+        if done:
+            if queue is not None:
+                await queue.put((index, newest))
+            return newest, fetched, True
+        last_id = page[-1].id
+
+
+async def fetch_messages_sharded(client, channel, start_date, shards, conn=None):
+    """Fetches [start_date, end_date] as concurrent date shards over the one client connection.
+
+    The shards' pages share one bounded store queue, stored in a worker thread while the
+    shards keep downloading, and the high-water mark moves as each run of shards from the
+    first one finishes. Returns how many messages arrived.
+    """
+    from tqdm.asyncio import tqdm
+
+    scheduler = FloodWaitScheduler(max_requests_in_flight)
+    queue = asyncio.Queue(maxsize=pipeline_queue_batches * shards)
+    # The last shard ends just after end_date so messages sent exactly at end_date are kept
+    shard_ranges = split_date_range(start_date, end_date + timedelta(microseconds=1), shards)
+    consumer = None
+    if conn is not None:
+        checkpoints = ShardCheckpoints(conn, start_date.isoformat(), len(shard_ranges))
+        consumer = asyncio.create_task(store_fetched(queue, checkpoints.store))
+    with tqdm(desc="Fetching messages") as progress:
+        results = await asyncio.gather(*(
+            fetch_shard(client, channel, shard_start, shard_end, scheduler, progress, queue if consumer else None, index)
+            for index, (shard_start, shard_end) in enumerate(shard_ranges)
+        ))
+    if consumer is not None:
+        await queue.put(None)
+        await consumer
+
+    for (shard_start, _), (_, _, completed) in zip(shard_ranges, results):
+        if not completed:
+            print(f"Fetching stopped early, history after {shard_start.isoformat()} is incomplete. Run again to continue.")
+            break
+    return sum(fetched for _, fetched, _ in results)
 
-            message_dict = message.to_dict()
-            serialized_message = serialize_message(message_dict)
-            messages.append(serialized_message)
-    except (FloodWaitError, RPCError) as e:
-        print(f"An error occurred: {e}")
-        await asyncio.sleep(e.seconds if isinstance(e, FloodWaitError) else 5)
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-    return messages
 
+async def start_client():
+    if replay_config.get("source"):
+        import replay
+
+        client = replay.client_from_config(replay_config)
+        print(f"Replaying {len(client.messages)} messages from {replay_config['source']} instead of connecting to Telegram")
+        return await client.start()
+
+    # Telethon is only imported by the paths that talk to Telegram
+    from telethon import TelegramClient
+    from telethon.errors import SessionPasswordNeededError
 
-async def shillbot_main():
     client = TelegramClient('session_name', api_id, api_hash)
 
     await client.start()
@@ -501,21 +565,157 @@ async def shillbot_main():
         except SessionPasswordNeededError:
             password = getpass('Please enter your password: ')
             await client.sign_in(password=password)
+    return client
+
 
+async def get_channel(client, url=None):
+    url = url or channel_url
     # Fetch the channel by its URL or username
-    channel = await client.get_entity(channel_url)
+    if url not in channel_entities:
+        channel_entities[url] = await client.get_entity(url)
+    return channel_entities[url]
+
+
+async def fetch_new_messages(client, channel, start_date, conn):
+    # Only pull what arrived since the last run if the stored history already covers start_date
+    state = message_store.load_fetch_state(conn)
+    covered_from = state.get("covered_from")
+    # Fetched messages are checkpointed to the store as they arrive, so an interrupted
+    # backfill picks up from its last checkpoint on the next run
+    if state.get("last_message_id") and covered_from and datetime.fromisoformat(covered_from) <= start_date:
+        last_message_date = datetime.fromisoformat(state["last_message_date"])
+        await fetch_messages(client, channel, last_message_date, min_id=state["last_message_id"], conn=conn, covered_from=covered_from)
+    elif fetch_shards > 1:
+        await fetch_messages_sharded(client, channel, start_date, fetch_shards, conn=conn)
+    else:
+        await fetch_messages(client, channel, start_date, conn=conn, covered_from=start_date.isoformat())
 
-    # Prompt for the start date
-    start_date = get_start_date()
 
-    messages = await fetch_messages(client, channel, start_date)
+async def fetch_channel(client, url, start_date):
+    conn = open_message_store(url)
+    try:
+        channel = await get_channel(client, url)
+        await fetch_new_messages(client, channel, start_date, conn)
+        if dataset_directory:
+            # Parquet writes block, so they run in a thread while the other channels keep fetching
+            with stats.stage("dataset"):
+                written = await asyncio.to_thread(dataset.sync_dataset, conn, dataset_directory, channels.channel_name(url))
+            if written:
+                print(f"Updated {written} day(s) of the {channels.channel_name(url)} dataset in {dataset_directory}")
+    finally:
+        conn.close()
+
+
+async def fetch_channels(client, urls, start_date):
+    # All channels are fetched at once over the same client, each into its own store with its own checkpoint
+    with stats.stage("fetch"):
+        await asyncio.gather(*(fetch_channel(client, url, start_date) for url in urls))
+    if replay_config.get("source"):
+        import replay
+
+        replay.print_stats(client)
+
+
+def channel_report_tables(urls, start_date, report_end):
+    """Report tables for one channel, or for several merged into one report."""
+    if len(urls) == 1:
+        # Reports merge the stored hourly rollups; only hours touched by the last fetch are recomputed
+        conn = open_message_store(urls[0])
+        try:
+            return rollups.report_tables_from_rollups(conn, start_date, report_end, format_date, parse_workers)
+        finally:
+            conn.close()
+
+    conns = open_channel_stores(urls)
+    try:
+        return channels.merged_report_tables(conns, start_date, report_end, format_date, parse_workers)
+    finally:
+        close_channel_stores(conns)
+
 
-    # Save to JSON
-    with open('raidboard_chat_history.json', 'w', encoding='utf-8') as f:
-        json.dump(messages, f, ensure_ascii=False, indent=4)
+def choose_report_channels():
+    if len(channel_urls) == 1:
+        return channel_urls
 
-    # Call the function to process and display the messages
-    display_selected_fields(messages)
+    options = "\n".join(f"{i}. {channels.channel_name(url)}" for i, url in enumerate(channel_urls, 1))
+    choice = input(f"Which channel should the report cover?\n0. All channels merged\n{options}\nEnter a number: ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= len(channel_urls):
+        return [channel_urls[int(choice) - 1]]
+    return channel_urls
+
+
+async def shillbot_main():
+    client = await start_client()
+
+    # Prompt for the start date
+    start_date = get_start_date()
+
+    await fetch_channels(client, channel_urls, start_date)
+
+    report_urls = choose_report_channels()
+    with stats.stage("aggregation"):
+        report_tables = channel_report_tables(report_urls, start_date, end_date)
+    prepare_and_save_tables(report_tables)
+
+
+async def live_main():
+    from telethon import events, utils
+
+    import live
+    import trending
+
+    client = await start_client()
+    conns = {}
+    sources = {}  # Peer id -> channel URL, to tell which channel an event came from
+    for url in channel_urls:
+        channel = await get_channel(client, url)
+        conns[url] = open_message_store(url)
+        sources[utils.get_peer_id(channel)] = url
+
+    # Start from what the stores already hold for today so the first snapshot isn't empty,
+    # and from the days before for the trending windows that reach back past midnight
+    today = datetime.now(local_tz).replace(hour=0, minute=0, second=0, microsecond=0)
+    state = live.LiveAggregates(format_date, trending.trending_from_stores(conns, today.timestamp() - 1))
+    seed = [message for conn in conns.values() for message in message_store.load_messages(conn, today)]
+    for message in sorted(seed, key=lambda message: message.date):
+        state.add(message)
+
+    pending = {url: [] for url in channel_urls}  # Live posts not yet written to the message stores
+
+    @client.on(events.NewMessage(chats=[channel_entities[url] for url in channel_urls]))
+    async def on_new_message(event):
+        url = sources.get(event.chat_id, channel_url)
+        message = message_store.MessageRecord.from_telethon(event.message)
+        pending[url].append(message)
+        stats.count("live_messages")
+        for notice in state.add(message):
+            print(f"[{channels.channel_name(url)}] {notice}" if len(channel_urls) > 1 else notice)
+
+    async def refresh_snapshots():
+        while True:
+            await asyncio.sleep(live_refresh_seconds)
+            # Live posts are stored as well (without moving the fetch checkpoint), so later reports include them
+            for url, messages in pending.items():
+                if messages:
+                    message_store.upsert_messages(conns[url], messages)
+                    messages.clear()
+            report_tables = state.report_tables()
+            live.print_tables(report_tables, state.message_count)
+            if live_snapshot_file:
+                live.write_snapshot(live_snapshot_file, report_tables, state.message_count)
+            if prometheus_file:
+                write_run_outputs(stats, "", prometheus_file)
+
+    refresher = asyncio.create_task(refresh_snapshots())
+    print(f"Following {', '.join(channel_urls)} live, tables refresh every {live_refresh_seconds}s. Press Ctrl+C to stop.")
+    try:
+        await client.run_until_disconnected()
+    finally:
+        refresher.cancel()
+        for url, messages in pending.items():
+            if messages:
+                message_store.upsert_messages(conns[url], messages)
+            conns[url].close()
 
 
 def search_token_instance(token_id):
@@ -526,10 +726,48 @@ def search_token_instance(token_id):
         # If the user chooses to fetch new messages, run the Shillbot main function
         asyncio.run(shillbot_main())
 
-    # Load the JSON data from the file
-    with open('raidboard_chat_history.json', 'r', encoding='utf-8') as f:
-        messages = json.load(f)
+    # Look the token up in every channel's store
+    conns = open_channel_stores(channel_urls)
+    print_token_searches(conns, [token_id])
+    close_channel_stores(conns)
+
 
+def search_watchlist_instances(watchlist_path):
+    """Prints search_token_instance's tables for every CA or ticker in a watchlist file, from one pass over the history."""
+    try:
+        terms = watchlist.read_watchlist(watchlist_path)
+    except OSError as e:
+        print(f"Unable to read the watchlist '{watchlist_path}': {e.strerror}. Exiting.")
+        return
+    conns = open_channel_stores(channel_urls)
+    print_token_searches(conns, terms)
+    close_channel_stores(conns)
+
+
+def print_token_searches(conns, terms):
+    """Prints the token tables for each term over the given channel stores ({channel name: conn})."""
+    with stats.stage("search"):
+        if len(conns) == 1:
+            token_ranks = message_store.load_token_ranks(next(iter(conns.values())))
+        else:
+            token_ranks = channels.merged_token_ranks(conns)
+
+        for token_id, messages_by_channel in channels.search_channels(conns, terms).items():
+            if len(terms) > 1:
+                print(f"\n=== {token_id} ===")
+            messages = sorted((message for messages in messages_by_channel.values() for message in messages), key=lambda message: message.date)
+            print_token_tables(token_id, *token_tables(token_id, messages, token_ranks))
+
+            # With several channels, show who shilled it first
+            if len(conns) > 1 and messages:
+                from tabulate import tabulate
+
+                first_seen = channels.first_seen_rows(messages_by_channel, format_date)
+                print(tabulate(first_seen, ["Channel", f"First Seen ({timezone_config})", "Posts"], tablefmt="fancy_grid"))
+
+
+def token_tables(token_id, messages, token_ranks):
+    """Builds the per-chart rows and the 5 most recent x.com rows for a token from its matching messages."""
     # Initialize counters and data structures
     chart_counter = Counter()
     chart_timestamps = defaultdict(list)
@@ -538,105 +776,61 @@ def search_token_instance(token_id):
     replies_data = defaultdict(list)
     bookmarks_data = defaultdict(list)
     x_com_instances = []  # To store instances with https://x.com/ links
-    all_token_counts = Counter()
-
-    # First, count occurrences of all tokens
-    for message in messages:
-        message_text = message.get("message", "")
-        token_name = extract_token_name(message_text)
-        if token_name:
-            all_token_counts[token_name] += 1
-
-    # Sort tokens by occurrences to assign ranks
-    sorted_tokens = sorted(all_token_counts.items(), key=lambda x: x[1], reverse=True)
-    token_ranks = {token: rank + 1 for rank, (token, _) in enumerate(sorted_tokens)}
 
     # Search through the messages for the specified token ID
     for message in messages:
         if search_token_in_message(message, token_id):
-            message_text = message.get("message", "")
-            token_name = extract_token_name(message_text)
-            url = None
-
-            # Correctly extract the URL that starts with "https://dexscreener.com/"
-            # **Updated to include the correct pattern**
-            if "entities" in message:
-                for entity in message["entities"]:
-                    if entity.get("_") == "MessageEntityTextUrl":
-                        temp_url = entity.get("url", "")
-                        if temp_url.startswith("https://dexscreener.com/"):
-                            url = temp_url
-                            break
-
-            # If URL not found in entities, search in message text
-            if not url:
-                chart_match = re.search(r'https://dexscreener\.com/\S+', message_text)
-                if chart_match:
-                    url = chart_match.group(0)
-
-            chart_href = url
-
-            date_str = message.get("date", "")
-            if date_str:
-                try:
-                    datetime_obj = datetime.fromisoformat(date_str)
-                except ValueError:
-                    datetime_obj = None
-            else:
-                datetime_obj = None
+            # Same parse as the Shillbot report, so token names and links match it
+            parsed = message_parser.parse_message(message.message, message.urls)
+            token_name = parsed.token_name
+            chart_href = parsed.chart_url
+
+            datetime_obj = message.date
 
             # Add to x.com instances if the link exists
-            if "https://x.com/" in message_text:
-                x_com_link = re.search(r'https://x\.com/\S+', message_text)
-                if x_com_link:
-                    x_com_link = x_com_link.group(0)
-                    datetime_obj_utc_plus_one = convert_and_format_date_utc_plus_1(datetime_obj.isoformat()) if datetime_obj else "Invalid date"
-                    x_com_instances.append((token_name, x_com_link, datetime_obj_utc_plus_one))
+            if parsed.x_com_link:
+                x_com_instances.append((token_name, parsed.x_com_link, datetime_obj))
 
             if chart_href and datetime_obj:  # Only use valid datetime objects
                 chart_counter[(token_name, chart_href)] += 1
                 chart_timestamps[(token_name, chart_href)].append(datetime_obj)
 
-                likes_text = retweets_text = replies_text = bookmarks_text = ""
+                # Metrics missing from the post count as 0
+                key = (token_name, chart_href)
+                for metric, metric_data in (("Likes", likes_data), ("Retweets", retweets_data), ("Replies", replies_data), ("Bookmarks", bookmarks_data)):
+                    reading = parsed.metrics.get(metric)
+                    metric_data[key].append(reading.value if reading is not None else 0)
 
-                # Process the message text for metrics
-                for text_item in message_text.split('\n'):
-                    if " Likes: " in text_item:
-                        likes_text = text_item.split(" Likes: ")[-1]
-                    elif " Retweets: " in text_item:
-                        retweets_text = text_item.split(" Retweets: ")[-1]
-                    elif " Replies: " in text_item:
-                        replies_text = text_item.split(" Replies: ")[-1]
-                    elif " Bookmarks: " in text_item:
-                        bookmarks_text = text_item.split(" Bookmarks: ")[-1]
+    chart_rows = []
+    for (token_name, chart_href), count in chart_counter.items():
+        avg_time_diff_str = calculate_avg_time_diffs(chart_timestamps[(token_name, chart_href)]) or "N/A"
+        avg_likes = sum(likes_data[(token_name, chart_href)]) / len(likes_data[(token_name, chart_href)]) if likes_data[(token_name, chart_href)] else 0
+        avg_retweets = sum(retweets_data[(token_name, chart_href)]) / len(retweets_data[(token_name, chart_href)]) if retweets_data[(token_name, chart_href)] else 0
+        avg_replies = sum(replies_data[(token_name, chart_href)]) / len(replies_data[(token_name, chart_href)]) if replies_data[(token_name, chart_href)] else 0
+        avg_bookmarks = sum(bookmarks_data[(token_name, chart_href)]) / len(bookmarks_data[(token_name, chart_href)]) if bookmarks_data[(token_name, chart_href)] else 0
 
-                key = (token_name, chart_href)
-                likes_data[key].append(parse_metric(likes_text))
-                retweets_data[key].append(parse_metric(retweets_text))
-                replies_data[key].append(parse_metric(replies_text))
-                bookmarks_data[key].append(parse_metric(bookmarks_text))
+        rank = token_ranks.get(token_name, "N/A")
 
-    # Print the main token table if data was found
-    if chart_counter:
-        for (token_name, chart_href), count in chart_counter.items():
-            avg_time_diff_str = calculate_avg_time_diffs(chart_timestamps[(token_name, chart_href)]) or "N/A"
-            avg_likes = sum(likes_data[(token_name, chart_href)]) / len(likes_data[(token_name, chart_href)]) if likes_data[(token_name, chart_href)] else 0
-            avg_retweets = sum(retweets_data[(token_name, chart_href)]) / len(retweets_data[(token_name, chart_href)]) if retweets_data[(token_name, chart_href)] else 0
-            avg_replies = sum(replies_data[(token_name, chart_href)]) / len(replies_data[(token_name, chart_href)]) if replies_data[(token_name, chart_href)] else 0
-            avg_bookmarks = sum(bookmarks_data[(token_name, chart_href)]) / len(bookmarks_data[(token_name, chart_href)]) if bookmarks_data[(token_name, chart_href)] else 0
+        chart_rows.append([rank, token_name, chart_href, count, avg_time_diff_str, f"{avg_likes:.2f}", f"{avg_retweets:.2f}", f"{avg_replies:.2f}", f"{avg_bookmarks:.2f}"])
+
+    # Keep the most recent 5 x.com instances
+    x_com_instances = sorted(x_com_instances, key=lambda x: x[2].timestamp() if x[2] else 0, reverse=True)  # Sort by most recent
+    most_recent_x_com_instances = x_com_instances[:5]  # Get only the 5 most recent instances
+    x_com_table_data = [[token_name, x_com_link, format_date(datetime_obj)] for token_name, x_com_link, datetime_obj in most_recent_x_com_instances]
+    return chart_rows, x_com_table_data
 
-            rank = token_ranks.get(token_name, "N/A")
 
-            table_data = [[rank, token_name, chart_href, count, avg_time_diff_str, f"{avg_likes:.2f}", f"{avg_retweets:.2f}", f"{avg_replies:.2f}", f"{avg_bookmarks:.2f}"]]
-            headers = ["Rank", "Token", "📈 Chart Link", "Occur.", "Avg Time (m:s)", "❤️", "🔄", "💬", "🔖"]
-            print(tabulate(table_data, headers, tablefmt="fancy_grid"))
+def print_token_tables(token_id, chart_rows, x_com_table_data):
+    if chart_rows or x_com_table_data:
+        from tabulate import tabulate  # Not loaded at all when there is no table to print
+
+    # Print the main token table if data was found
+    for row in chart_rows:
+        print(tabulate([row], exporters.TOKEN_CHART_HEADERS, tablefmt="fancy_grid"))
 
     # Print the most recent 5 x.com instances table if data was found
-    if x_com_instances:
-        x_com_instances = sorted(x_com_instances, key=lambda x: x[2], reverse=True)  # Sort by most recent
-        most_recent_x_com_instances = x_com_instances[:5]  # Get only the 5 most recent instances
-        x_com_table_data = [[token_name, x_com_link, datetime_obj] for token_name, x_com_link, datetime_obj in most_recent_x_com_instances]
-        x_com_headers = ["Token", "🔗 x.com Link", "Time (UTC+1)"]
+    if x_com_table_data:
+        x_com_headers = exporters.X_COM_HEADERS[:2] + [f"Time ({timezone_config})"]
         print(tabulate(x_com_table_data, x_com_headers, tablefmt="fancy_grid"))
     else:
         print(f"\nNo information could be found from this token,")
@@ -644,8 +838,113 @@ def search_token_instance(token_id):
         print(f"has been no interaction between raidboard and this token '{token_id}'.")
 
 
-def main():
-    choice = input("Choose an option:\n1. Shillbot (check what is being shilled today or from a specific date)\n2. Search a token\nEnter 1 or 2: ").strip()
+def serve_queries():
+    """Answers token searches and reports over HTTP from one long-lived process, see server.py."""
+    import server
+
+    conns = open_channel_stores(channel_urls)
+    service = server.QueryService(conns, token_tables, format_date, local_tz, parse_workers)
+    # Today's report (and with it the rollups) is built before the first request arrives
+    service.report(*service.report_range({}))
+    try:
+        server.serve(service, server_host, server_port)
+    finally:
+        close_channel_stores(conns)
+
+
+def parse_day(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a date in YYYY-MM-DD format")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Run the Shillbot report and token searches without prompts, e.g. from cron.")
+    parser.add_argument("--start", type=parse_day, help="first day of the report (YYYY-MM-DD), defaults to today")
+    parser.add_argument("--end", type=parse_day, help="last day of the report (YYYY-MM-DD), defaults to now")
+    parser.add_argument("--no-fetch", action="store_true", help="only use the stored messages, don't connect to telegram")
+    parser.add_argument("--report", metavar="FILE", help="save the report to this file (a folder for csv/parquet), or 'auto' for a dated one in output_directory")
+    parser.add_argument("--search", metavar="CA", action="append", default=[], help="token CA or ticker to search, can be given many times")
+    parser.add_argument("--watchlist", metavar="FILE", help="file of token CAs or tickers to search, one per line")
+    parser.add_argument("--channel", metavar="URL", action="append", help="only use this channel, can be given many times (defaults to all configured channels)")
+    parser.add_argument("--merge", action="store_true", help="one report merged over the channels instead of one report per channel")
+    parser.add_argument("--trending", nargs="?", const="acceleration", choices=["acceleration", "velocity"], help="print the tokens heating up over the last 5m, 1h and 24h (up to --end), ranked by acceleration (default) or velocity")
+    parser.add_argument("--serve", action="store_true", help="after the other jobs, answer searches and reports over HTTP on server_host:server_port until stopped")
+    parser.add_argument("--run-summary", metavar="FILE", help="write a JSON summary of the run's stage timings and counters, '-' prints it")
+    parser.add_argument("--prometheus", metavar="FILE", help="write the run's metrics in prometheus text format")
+    parser.add_argument("--profile", metavar="STAGE", help="run one stage (fetch, parse, store, aggregation, export, search, dataset) under cProfile")
+    parser.add_argument("--replay", metavar="SOURCE", help="fetch from a message store (.db), a JSON history (.json) or synthetic:COUNT instead of telegram")
+    return parser.parse_args(argv)
+
+
+async def run_batch(args):
+    """Runs every job from the command line over one client connection."""
+    from tabulate import tabulate
+
+    start_date = local_tz.localize(args.start) if args.start else datetime.now(local_tz).replace(hour=0, minute=0, second=0, microsecond=0)
+    # The end day is included up to its last second, like the end_date of an interactive run
+    report_end = local_tz.localize(args.end + timedelta(days=1)) - timedelta(seconds=1) if args.end else end_date
+    urls = args.channel or channel_urls
+
+    if not args.no_fetch:
+        client = await start_client()
+        try:
+            await fetch_channels(client, urls, start_date)
+        finally:
+            await client.disconnect()
+
+    report_groups = [urls] if args.merge or len(urls) == 1 else [[url] for url in urls]
+    for report_urls in report_groups:
+        with stats.stage("aggregation"):
+            report_tables = channel_report_tables(report_urls, start_date, report_end)
+        name = channels.channel_name(report_urls[0]) if len(report_urls) == 1 else "all channels"
+        print(f"\nMost recurring charts in {name} from {format_date(start_date)} to {format_date(report_end)}")
+        print(tabulate(report_tables["most_recurring_charts"], exporters.MOST_RECURRING_HEADERS, tablefmt="fancy_grid"))
+        if "first_shilled" in report_tables:
+            print(tabulate(report_tables["first_shilled"][:10], exporters.FIRST_SHILLED_HEADERS, tablefmt="fancy_grid"))
+
+        if args.report:
+            if not os.path.exists(output_directory):
+                os.makedirs(output_directory)
+            # One file per channel when the channels are reported separately
+            suffix = f" {name}" if len(report_groups) > 1 else ""
+            if args.report == "auto":
+                file_path = generate_versioned_filename(datetime.now().strftime("%d.%m.%Y") + suffix, output_directory, report_extension)
+            else:
+                root, extension = os.path.splitext(args.report)
+                file_path = f"{root}{suffix}{extension}"
+            save_report(report_tables, file_path)
+            print(f"\nThe tables have been saved to {file_path}")
+
+    if args.trending:
+        import trending
+
+        conns = open_channel_stores(urls)
+        try:
+            with stats.stage("trending"):
+                now = report_end.timestamp() if args.end else datetime.now().timestamp()
+                tables = trending.trending_tables(trending.trending_from_stores(conns, now), args.trending, now=now)
+            trending.print_trending(tables, args.trending)
+        finally:
+            close_channel_stores(conns)
+
+    terms = list(args.search)
+    if args.watchlist:
+        try:
+            terms += watchlist.read_watchlist(args.watchlist)
+        except OSError as e:
+            print(f"Unable to read the watchlist '{args.watchlist}': {e.strerror}, skipping it.")
+    if terms:
+        conns = open_channel_stores(urls)
+        try:
+            print_token_searches(conns, terms)
+        finally:
+            close_channel_stores(conns)
+
+
+def run_menu():
+    choice = input("Choose an option:\n1. Shillbot (check what is being shilled today or from a specific date)\n2. Search a token\n3. Live (follow raidboard as it posts)\n4. Search a watchlist of tokens\n5. Serve searches and reports to other tools over HTTP\nEnter 1, 2, 3, 4 or 5: ").strip()
 
     if choice == '1':
         # Run the Shillbot
@@ -654,9 +953,44 @@ def main():
         # Run the Detect feature
         token_id = input("Enter the token CA (contract address): ").strip()
         search_token_instance(token_id)
+    elif choice == '3':
+        # Follow new posts until interrupted
+        try:
+            asyncio.run(live_main())
+        except KeyboardInterrupt:
+            print("\nStopped following.")
+    elif choice == '4':
+        # Search every CA or ticker in a watchlist file at once
+        watchlist_path = input("Enter the watchlist file (one CA or ticker per line): ").strip()
+        search_watchlist_instances(watchlist_path)
+    elif choice == '5':
+        serve_queries()
     else:
         print("Invalid choice. Exiting.")
 
 
+def main():
+    global run_summary_file, prometheus_file
+    load_config()
+
+    try:
+        # Any command-line arguments run the headless batch mode instead of the menu
+        if len(sys.argv) > 1:
+            args = parse_args(sys.argv[1:])
+            if args.replay:
+                replay_config["source"] = args.replay
+            run_summary_file = args.run_summary or run_summary_file
+            prometheus_file = args.prometheus or prometheus_file
+            stats.profile_stage = args.profile or stats.profile_stage
+            asyncio.run(run_batch(args))
+            if args.serve:
+                serve_queries()
+        else:
+            run_menu()
+    finally:
+        # Written even when a run fails part way, since that is when the timings matter most
+        write_run_outputs(stats, run_summary_file, prometheus_file)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,121 @@
+import re
+
+METRICS = ("Likes", "Retweets", "Replies", "Bookmarks")
+
+# Raidboard boilerplate, removed in one substitution instead of one re.sub per pattern
+BOILERPLATE_PATTERN = re.compile(
+    r"📈 Chart   ⏫ Trending   ✳️ Events"
+    r"|🐬 \| D\.RAIDBOARD #[0-9]+ \| [0-9]+⚡️"
+    r"|[🐳🐬⚡️]"
+)
+
+# Tried in order, the first one that matches names the token
+TOKEN_NAME_PATTERNS = [
+    re.compile(r'^(.*?)\s(?:Started|Just)', re.IGNORECASE),  # Matches "TokenName Started..." or "TokenName Just..."
+    re.compile(r'^🚀\s*(.*?)\s*🚀', re.IGNORECASE),           # Matches "🚀 TokenName 🚀"
+    re.compile(r'^Token:\s*(\S+)', re.IGNORECASE),           # Matches "Token: TokenName"
+    re.compile(r'Launching\s*(\S+)', re.IGNORECASE),         # Matches "Launching TokenName"
+    re.compile(r'^New Shill:\s*(\S+)', re.IGNORECASE),       # Matches "New Shill: TokenName"
+]
+
+# " Likes: 120 (+15)" style lines, captured up to the end of the line
+METRIC_LINE_PATTERN = re.compile(r' (Likes|Retweets|Replies|Bookmarks): ([^\n]*)')
+
+CHART_URL_PATTERN = re.compile(r'https://dexscreener\.com/\S+')
+X_COM_URL_PATTERN = re.compile(r'https://x\.com/\S+')
+
+
+class MetricReading:
+    """One metric line, e.g. "Likes: 120 (+15)" is value 120, delta 15 and disparity 105."""
+
+    __slots__ = ("value", "delta", "disparity")
+
+    def __init__(self, value, delta, disparity):
+        self.value = value
+        self.delta = delta
+        self.disparity = disparity
+
+    def __repr__(self):
+        return f"MetricReading(value={self.value}, delta={self.delta}, disparity={self.disparity})"
+
+
+class ParsedMessage:
+    """Everything the reports and token search read from a raidboard post.
+
+    metrics maps each metric name found in the post to its MetricReading.
+    """
+
+    __slots__ = ("token_name", "message_text", "chart_url", "x_com_link", "metrics")
+
+    def __init__(self, token_name, message_text, chart_url, x_com_link, metrics):
+        self.token_name = token_name
+        self.message_text = message_text
+        self.chart_url = chart_url
+        self.x_com_link = x_com_link
+        self.metrics = metrics
+
+    def __repr__(self):
+        return f"ParsedMessage(token_name={self.token_name!r}, chart_url={self.chart_url!r})"
+
+
+def clean_message_text(message_text):
+    return BOILERPLATE_PATTERN.sub('', message_text).strip()
+
+
+def extract_token_name(message_text):
+    for pattern in TOKEN_NAME_PATTERNS:
+        match = pattern.search(message_text)
+        if match:
+            return match.group(1).strip()
+    return "Unknown Token"
+
+
+def parse_metric(text):
+    try:
+        return int(text.split()[0].replace("(", "").replace("+", ""))
+    except (ValueError, IndexError):
+        return 0
+
+
+def calculate_disparity(text):
+    try:
+        a = int(text.split()[0])
+        x = int(text.split("(+")[1].replace(")", ""))
+        return a - x
+    except (ValueError, IndexError):
+        return 0
+
+
+def read_metric(text):
+    try:
+        delta = int(text.split("(+")[1].replace(")", ""))
+    except (ValueError, IndexError):
+        delta = None
+    return MetricReading(parse_metric(text), delta, calculate_disparity(text))
+
+
+def parse_message(message_text, urls=()):
+    """Parses a raw post and its entity URLs in one pass over the text."""
+    message_text = clean_message_text(message_text)
+
+    chart_url = x_com_link = ""
+    for url in urls:
+        if url.startswith("https://dexscreener.com/"):
+            chart_url = url
+        elif url.startswith("https://x.com/"):
+            x_com_link = url
+
+    # Fall back to links written out in the text itself
+    if not chart_url:
+        chart_match = CHART_URL_PATTERN.search(message_text)
+        if chart_match:
+            chart_url = chart_match.group(0)
+    if not x_com_link:
+        x_com_match = X_COM_URL_PATTERN.search(message_text)
+        if x_com_match:
+            x_com_link = x_com_match.group(0)
+
+    # A later line for the same metric replaces an earlier one
+    metrics = {metric: read_metric(text) for metric, text in METRIC_LINE_PATTERN.findall(message_text)}
+
+    return ParsedMessage(extract_token_name(message_text), message_text, chart_url, x_com_link, metrics)
@@ -0,0 +1,386 @@
+import json
+import os
+import re
+import sqlite3
+from collections import Counter
+from datetime import datetime, timezone
+
+import message_parser
+
+# SQLite is the system of record for fetched messages. Rows are only ever inserted or
+# refreshed in place (views/forwards keep changing), so a run never rewrites the history.
+# The message columns mirror MessageRecord; urls holds the entity URLs joined by newlines.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    date INTEGER NOT NULL,
+    token_name TEXT,
+    message TEXT NOT NULL,
+    urls TEXT NOT NULL,
+    views INTEGER NOT NULL,
+    forwards INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_date ON messages (date);
+CREATE INDEX IF NOT EXISTS idx_messages_token ON messages (token_name);
+
+CREATE TABLE IF NOT EXISTS fetch_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS token_index (
+    term TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    PRIMARY KEY (term, message_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_token_index_message ON token_index (message_id);
+
+CREATE TABLE IF NOT EXISTS token_ranks (
+    token_name TEXT PRIMARY KEY,
+    occurrences INTEGER NOT NULL,
+    first_id INTEGER NOT NULL,
+    rank INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS dirty_hours (
+    hour INTEGER PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS dataset_days (
+    day INTEGER PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS hourly_top (
+    hour INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (hour, metric, message_id)
+) WITHOUT ROWID;
+"""
+
+# Per-hour rollups for each (token, chart, x.com link), see rollups.py. For every metric:
+# readings found, their sum and max, the first message with a reading, and the largest
+# disparity with the message (and date) it first occurred in.
+ROLLUP_METRIC_FIELDS = ("count", "sum", "max", "first_id", "disparity_max", "disparity_id", "disparity_at")
+ROLLUP_COLUMNS = ["hour", "token_name", "url", "x_com_link", "occurrences", "first_id", "first_seen", "last_seen"] + [
+    f"{metric.lower()}_{field}" for metric in message_parser.METRICS for field in ROLLUP_METRIC_FIELDS
+]
+SCHEMA += f"""
+CREATE TABLE IF NOT EXISTS hourly_rollups (
+    {", ".join(ROLLUP_COLUMNS)},
+    PRIMARY KEY (hour, token_name, url, x_com_link)
+);
+"""
+
+# Bumped whenever a derived table needs rebuilding from the stored messages
+SCHEMA_VERSION = 6
+HOUR = 3600
+DAY = 86400
+
+# Terms worth indexing: EVM and Solana contract addresses, dexscreener pair ids and x.com status ids
+EVM_ADDRESS_PATTERN = re.compile(r'0x[0-9a-fA-F]{40}')
+BASE58_ADDRESS_PATTERN = re.compile(r'[1-9A-HJ-NP-Za-km-z]{32,44}')
+DEXSCREENER_PAIR_PATTERN = re.compile(r'dexscreener\.com/[^/\s?#]+/([^/\s?#]+)', re.IGNORECASE)
+X_COM_STATUS_PATTERN = re.compile(r'x\.com/[^/\s?#]+/status/(\d+)', re.IGNORECASE)
+# Search terms that are whole identifiers (pair ids are addresses too), which the index finds exactly
+IDENTIFIER_PATTERNS = (EVM_ADDRESS_PATTERN, BASE58_ADDRESS_PATTERN, re.compile(r'\d{15,20}'))
+
+
+class MessageRecord:
+    """The fields the reports read from a Telegram message, and nothing else.
+
+    date is an aware UTC datetime, urls are the MessageEntityTextUrl URLs in entity order.
+    """
+
+    __slots__ = ("id", "date", "message", "urls", "views", "forwards")
+
+    def __init__(self, id, date, message, urls, views, forwards):
+        self.id = id
+        self.date = date
+        self.message = message
+        self.urls = urls
+        self.views = views
+        self.forwards = forwards
+
+    @classmethod
+    def from_telethon(cls, message):
+        urls = tuple(entity.url for entity in message.entities or () if type(entity).__name__ == "MessageEntityTextUrl")
+        return cls(message.id, message.date, message.message or "", urls, message.views or 0, message.forwards or 0)
+
+    @classmethod
+    def from_dict(cls, message_dict):
+        """Builds a record from a serialized message.to_dict(), as found in raidboard_chat_history.json."""
+        urls = tuple(
+            entity.get("url", "") for entity in message_dict.get("entities") or []
+            if entity.get("_") == "MessageEntityTextUrl"
+        )
+        return cls(
+            message_dict["id"],
+            datetime.fromisoformat(message_dict["date"]) if message_dict.get("date") else None,
+            message_dict.get("message") or "",
+            urls,
+            message_dict.get("views") or 0,
+            message_dict.get("forwards") or 0,
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        message_id, date, message, urls, views, forwards = row
+        return cls(message_id, from_timestamp(date), message, tuple(urls.split("\n")) if urls else (), views, forwards)
+
+    def __reduce__(self):
+        # Pickled as constructor arguments, which is much cheaper than slot state when
+        # batches of records are sent to the parse workers
+        return MessageRecord, (self.id, self.date, self.message, self.urls, self.views, self.forwards)
+
+    def __repr__(self):
+        return f"MessageRecord(id={self.id}, date={self.date.isoformat() if self.date else None})"
+
+
+RECORD_COLUMNS = "id, date, message, urls, views, forwards"
+
+
+def open_store(path):
+    # The fetch pipeline writes from a worker thread while the event loop downloads; a
+    # connection is still only ever used by one thread at a time
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < 3 and "data" in [column[1] for column in conn.execute("PRAGMA table_info(messages)")]:
+        migrate_message_blobs(conn)
+    conn.executescript(SCHEMA)
+    if version < 5:
+        rebuild_token_index(conn)
+        with conn:
+            conn.execute(f"INSERT OR IGNORE INTO dirty_hours (hour) SELECT DISTINCT date / {HOUR} * {HOUR} FROM messages")
+    if version < 6:
+        # Every stored day goes into the first dataset export
+        with conn:
+            conn.execute(f"INSERT OR IGNORE INTO dataset_days (day) SELECT DISTINCT date / {DAY} * {DAY} FROM messages")
+    if version < SCHEMA_VERSION:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+
+def migrate_message_blobs(conn):
+    """Rewrites stores that kept the whole message.to_dict() as JSON into the compact record columns."""
+    with conn:
+        conn.execute("ALTER TABLE messages RENAME TO messages_blobs")
+        conn.execute("DROP INDEX IF EXISTS idx_messages_date")
+        conn.execute("DROP INDEX IF EXISTS idx_messages_token")
+        conn.executescript(SCHEMA)
+        for message_id, date, token_name, data in conn.execute("SELECT id, date, token_name, data FROM messages_blobs").fetchall():
+            record = MessageRecord.from_dict(json.loads(data))
+            conn.execute(
+                f"INSERT INTO messages (token_name, {RECORD_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (token_name, message_id, date, record.message, "\n".join(record.urls), record.views, record.forwards),
+            )
+        conn.execute("DROP TABLE messages_blobs")
+    conn.execute("VACUUM")
+
+
+def to_timestamp(date):
+    return int(date.timestamp())
+
+
+def from_timestamp(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+def index_terms(message, token_name):
+    """Returns the lowercased lookup terms a message should be found under."""
+    terms = set()
+    for text in (message.message,) + message.urls:
+        terms.update(EVM_ADDRESS_PATTERN.findall(text))
+        terms.update(BASE58_ADDRESS_PATTERN.findall(text))
+        terms.update(DEXSCREENER_PAIR_PATTERN.findall(text))
+        terms.update(X_COM_STATUS_PATTERN.findall(text))
+    if token_name:
+        terms.add(token_name)
+    return {term.lower() for term in terms}
+
+
+def token_name_of(message):
+    return message_parser.extract_token_name(message_parser.clean_message_text(message.message))
+
+
+def upsert_messages(conn, messages):
+    """Inserts new messages and refreshes the ones we already have, keyed on message id.
+
+    The token index and occurrence ranks are maintained in the same transaction, and the
+    hours and days the messages fall in are marked for rollups.refresh_rollups and
+    dataset.sync_dataset to rewrite.
+    """
+    rows = []
+    terms = []
+    for message in messages:
+        if not message.date:
+            continue
+        token_name = token_name_of(message)
+        rows.append((message.id, to_timestamp(message.date), token_name, message.message, "\n".join(message.urls), message.views, message.forwards))
+        terms.extend((term, message.id) for term in index_terms(message, token_name))
+    if not rows:
+        return 0
+
+    with conn:
+        previous_tokens = dict(select_in(conn, "SELECT id, token_name FROM messages WHERE id IN ({})", [row[0] for row in rows]))
+        conn.executemany(
+            "INSERT INTO messages (id, date, token_name, message, urls, views, forwards) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET date = excluded.date, token_name = excluded.token_name, message = excluded.message, "
+            "urls = excluded.urls, views = excluded.views, forwards = excluded.forwards",
+            rows,
+        )
+        conn.executemany("DELETE FROM token_index WHERE message_id = ?", [(message_id,) for message_id in previous_tokens])
+        conn.executemany("INSERT OR IGNORE INTO token_index (term, message_id) VALUES (?, ?)", terms)
+        conn.executemany("INSERT OR IGNORE INTO dirty_hours (hour) VALUES (?)", {(row[1] // HOUR * HOUR,) for row in rows})
+        conn.executemany("INSERT OR IGNORE INTO dataset_days (day) VALUES (?)", {(row[1] // DAY * DAY,) for row in rows})
+
+        count_changes = Counter()
+        first_ids = {}
+        for message_id, _, token_name, *_ in rows:
+            if message_id in previous_tokens:
+                if previous_tokens[message_id] == token_name:
+                    continue
+                count_changes[previous_tokens[message_id]] -= 1
+            count_changes[token_name] += 1
+            first_ids[token_name] = min(first_ids.get(token_name, message_id), message_id)
+        update_token_ranks(conn, count_changes, first_ids)
+    return len(rows)
+
+
+def select_in(conn, query, values, chunk_size=500):
+    """Runs a "WHERE x IN (...)" query in chunks that stay under SQLite's variable limit."""
+    results = []
+    for i in range(0, len(values), chunk_size):
+        chunk = values[i:i + chunk_size]
+        results.extend(conn.execute(query.format(", ".join("?" * len(chunk))), chunk))
+    return results
+
+
+def update_token_ranks(conn, count_changes, first_ids):
+    conn.executemany(
+        "INSERT INTO token_ranks (token_name, occurrences, first_id) VALUES (?, ?, ?) "
+        "ON CONFLICT(token_name) DO UPDATE SET occurrences = occurrences + excluded.occurrences, "
+        "first_id = MIN(first_id, excluded.first_id)",
+        [(token_name, change, first_ids.get(token_name, 0)) for token_name, change in count_changes.items() if change],
+    )
+    conn.execute("DELETE FROM token_ranks WHERE occurrences <= 0")
+    assign_ranks(conn)
+
+
+def assign_ranks(conn):
+    # Ties keep the order tokens first appeared in, like sorting a Counter built in id order
+    ranked = conn.execute("SELECT token_name FROM token_ranks ORDER BY occurrences DESC, first_id").fetchall()
+    conn.executemany("UPDATE token_ranks SET rank = ? WHERE token_name = ?", [(rank + 1, token_name) for rank, (token_name,) in enumerate(ranked)])
+
+
+def rebuild_token_index(conn):
+    """Recomputes token names, the token index and ranks from the stored messages."""
+    with conn:
+        conn.execute("DELETE FROM token_index")
+        conn.execute("DELETE FROM token_ranks")
+        for row in conn.execute(f"SELECT {RECORD_COLUMNS} FROM messages").fetchall():
+            message = MessageRecord.from_row(row)
+            message_id = message.id
+            token_name = token_name_of(message)
+            conn.execute("UPDATE messages SET token_name = ? WHERE id = ?", (token_name, message_id))
+            terms = index_terms(message, token_name)
+            conn.executemany("INSERT OR IGNORE INTO token_index (term, message_id) VALUES (?, ?)", [(term, message_id) for term in terms])
+        conn.execute(
+            "INSERT INTO token_ranks (token_name, occurrences, first_id) "
+            "SELECT token_name, COUNT(*), MIN(id) FROM messages GROUP BY token_name"
+        )
+        assign_ranks(conn)
+
+
+def load_messages(conn, start_date=None, end_date=None):
+    """Returns the stored messages in id order, optionally limited to [start_date, end_date]."""
+    query = f"SELECT {RECORD_COLUMNS} FROM messages"
+    conditions = []
+    params = []
+    if start_date is not None:
+        conditions.append("date >= ?")
+        params.append(int(start_date.timestamp()))
+    if end_date is not None:
+        conditions.append("date <= ?")
+        params.append(int(end_date.timestamp()))
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY id"
+    return [MessageRecord.from_row(row) for row in conn.execute(query, params)]
+
+
+def load_messages_between(conn, start_ts, end_ts):
+    """Returns the messages dated in [start_ts, end_ts) epoch seconds, in id order."""
+    query = f"SELECT {RECORD_COLUMNS} FROM messages WHERE date >= ? AND date < ? ORDER BY id"
+    return [MessageRecord.from_row(row) for row in conn.execute(query, (start_ts, end_ts))]
+
+
+def load_messages_by_id(conn, message_ids):
+    rows = select_in(conn, f"SELECT {RECORD_COLUMNS} FROM messages WHERE id IN ({{}})", list(message_ids))
+    return [MessageRecord.from_row(row) for row in sorted(rows)]
+
+
+def is_identifier(term):
+    """Whether term is a CA, pair id or x.com status id on its own, rather than a ticker or a name."""
+    return any(pattern.fullmatch(term) for pattern in IDENTIFIER_PATTERNS)
+
+
+def find_messages_for_terms(conn, terms):
+    """Looks up many terms at once; returns {term: messages} for the lowercased identifier terms the index knows."""
+    terms = list({term.lower() for term in terms if is_identifier(term)})
+    hits = select_in(conn, "SELECT term, message_id FROM token_index WHERE term IN ({})", terms)
+    records = {message.id: message for message in load_messages_by_id(conn, {message_id for _, message_id in hits})}
+    matches = {}
+    for term, message_id in sorted(hits, key=lambda hit: hit[1]):
+        matches.setdefault(term, []).append(records[message_id])
+    return matches
+
+
+def load_token_ranks(conn):
+    return dict(conn.execute("SELECT token_name, rank FROM token_ranks"))
+
+
+def load_token_occurrences(conn):
+    """{token name: (occurrences, date of its first message as epoch seconds)}."""
+    rows = conn.execute(
+        "SELECT token_ranks.token_name, token_ranks.occurrences, messages.date FROM token_ranks "
+        "LEFT JOIN messages ON messages.id = token_ranks.first_id"
+    )
+    return {token_name: (occurrences, first_date) for token_name, occurrences, first_date in rows}
+
+
+def count_messages(conn):
+    return conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+
+def load_fetch_state(conn):
+    return {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM fetch_state")}
+
+
+def save_fetch_state(conn, state):
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO fetch_state (key, value) VALUES (?, ?)",
+            [(key, json.dumps(value)) for key, value in state.items()],
+        )
+
+
+def import_json_history(conn, history_file, fetch_state_file):
+    """One-off migration of raidboard_chat_history.json (and its fetch state) into an empty store."""
+    if count_messages(conn) or not os.path.exists(history_file):
+        return 0
+
+    with open(history_file, 'r', encoding='utf-8') as f:
+        messages = [MessageRecord.from_dict(message) for message in json.load(f) if "id" in message]
+    imported = upsert_messages(conn, messages)
+
+    if os.path.exists(fetch_state_file):
+        try:
+            with open(fetch_state_file, 'r', encoding='utf-8') as f:
+                save_fetch_state(conn, json.load(f))
+        except (OSError, ValueError):
+            pass
+    return imported
@@ -0,0 +1,34 @@
+import os
+
+# Below this many messages, starting the workers and pickling the messages over costs more than the parse saves
+PARALLEL_MIN_MESSAGES = 20000
+CHUNK_SIZE = 2000
+
+
+def worker_count(workers=0):
+    """workers from config.json's parse_workers; 0 means one per CPU core."""
+    return workers or os.cpu_count() or 1
+
+
+def use_pool(message_count, workers=0):
+    return worker_count(workers) > 1 and message_count >= PARALLEL_MIN_MESSAGES
+
+
+def chunked(items, size=CHUNK_SIZE):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def process_pool(workers=0):
+    # Loads multiprocessing, which only runs that actually use a pool should pay for
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(max_workers=worker_count(workers))
+
+
+def map_chunks(function, chunks, workers=0):
+    """function(chunk) for every chunk on a process pool, returned in chunk order.
+
+    function must be a module-level function, so Windows' spawned workers can import it.
+    """
+    with process_pool(workers) as pool:
+        return list(pool.map(function, chunks))
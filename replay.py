@@ -0,0 +1,180 @@
+import asyncio
+import bisect
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+import message_store
+
+
+class MessageEntityTextUrl:
+    """Named like Telethon's entity type, which is all MessageRecord.from_telethon checks for."""
+
+    __slots__ = ("url",)
+
+    def __init__(self, url):
+        self.url = url
+
+
+class ReplayMessage:
+    """The attributes of a Telethon Message the fetchers read."""
+
+    __slots__ = ("id", "date", "message", "entities", "views", "forwards")
+
+    def __init__(self, record):
+        self.id = record.id
+        self.date = record.date
+        self.message = record.message
+        self.entities = [MessageEntityTextUrl(url) for url in record.urls]
+        self.views = record.views
+        self.forwards = record.forwards
+
+
+class ReplayClient:
+    """Stands in for TelegramClient when fetching, serving recorded or synthetic messages.
+
+    Answers iter_messages/get_messages the way Telegram pages a channel, one request per page
+    of up to page_size messages. Every request waits latency seconds (plus up to jitter), and
+    is answered with a FloodWaitError with probability flood_wait_rate or drops the connection
+    with probability disconnect_rate, so throughput and retry handling can be tuned offline.
+    Every channel replays the same messages.
+    """
+
+    def __init__(self, records, latency=0.0, jitter=0.0, flood_wait_rate=0.0, flood_wait_seconds=1,
+                 disconnect_rate=0.0, page_size=100, seed=0):
+        self.messages = [ReplayMessage(record) for record in sorted(records, key=lambda record: record.id)]
+        self.dates = [message.date for message in self.messages]
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_wait_rate = flood_wait_rate
+        self.flood_wait_seconds = flood_wait_seconds
+        self.disconnect_rate = disconnect_rate
+        self.page_size = page_size
+        self.rng = random.Random(seed)
+        self.connected = False
+        self.requests = 0
+        self.flood_waits = 0
+        self.disconnects = 0
+        self.messages_served = 0
+
+    async def start(self):
+        self.connected = True
+        return self
+
+    async def connect(self):
+        self.connected = True
+
+    async def disconnect(self):
+        self.connected = False
+
+    def is_connected(self):
+        return self.connected
+
+    async def is_user_authorized(self):
+        return True
+
+    async def get_entity(self, url):
+        await self.request()
+        return url
+
+    async def request(self):
+        """One round trip: latency first, then the injected failures."""
+        from telethon.errors import FloodWaitError
+
+        if not self.connected:
+            raise ConnectionError("Replay client is disconnected")
+        self.requests += 1
+        await asyncio.sleep(self.latency + self.rng.random() * self.jitter)
+        if self.rng.random() < self.flood_wait_rate:
+            self.flood_waits += 1
+            raise FloodWaitError(request=None, capture=self.flood_wait_seconds)
+        if self.rng.random() < self.disconnect_rate:
+            self.disconnects += 1
+            self.connected = False
+            raise ConnectionError("Replay client dropped the connection")
+
+    def select(self, limit, reverse, offset_date, min_id, max_id):
+        # Like Telegram: oldest first from offset_date when reversed, otherwise newest first before it
+        if reverse:
+            start = bisect.bisect_left(self.dates, offset_date) if offset_date else 0
+            candidates = self.messages[start:]
+        else:
+            end = bisect.bisect_left(self.dates, offset_date) if offset_date else len(self.messages)
+            candidates = self.messages[end - 1::-1] if end else []
+        page = []
+        for message in candidates:
+            if message.id <= min_id:
+                if reverse:
+                    continue
+                break  # Newest first, so every message left is older still
+            if max_id and message.id >= max_id:
+                if reverse:
+                    break
+                continue
+            page.append(message)
+            if len(page) == limit:
+                break
+        return page
+
+    async def get_messages(self, entity, limit=1, reverse=False, offset_date=None, min_id=0, max_id=0):
+        await self.request()
+        page = self.select(min(limit or self.page_size, self.page_size), reverse, offset_date, min_id, max_id)
+        self.messages_served += len(page)
+        return page
+
+    async def iter_messages(self, entity, limit=None, reverse=False, offset_date=None, min_id=0, max_id=0):
+        served = 0
+        while limit is None or served < limit:
+            page_limit = self.page_size if limit is None else min(self.page_size, limit - served)
+            page = await self.get_messages(entity, page_limit, reverse, offset_date, min_id, max_id)
+            for message in page:
+                yield message
+            served += len(page)
+            if len(page) < page_limit:
+                return
+            # The next page continues after the last message, like Telethon's offset_id
+            if reverse:
+                min_id = page[-1].id
+            else:
+                max_id = page[-1].id
+            offset_date = None
+
+
+def load_records(source):
+    """Messages to replay: a message store (.db), a JSON history (.json) or "synthetic:COUNT".
+
+    Synthetic messages are generated to end now, so they fall inside today's fetch range.
+    """
+    if source.startswith("synthetic:"):
+        import synthetic
+
+        count = int(source.split(":", 1)[1])
+        start = datetime.now(timezone.utc) - timedelta(seconds=20 * count)
+        return synthetic.generate_records(count, start=start)
+    if source.endswith(".json"):
+        with open(source, "r", encoding="utf-8") as f:
+            return [message_store.MessageRecord.from_dict(message) for message in json.load(f) if "id" in message]
+    conn = message_store.open_store(source)
+    try:
+        return message_store.load_messages(conn)
+    finally:
+        conn.close()
+
+
+def client_from_config(replay_config):
+    """A ReplayClient from the "replay" section of config.json."""
+    return ReplayClient(
+        load_records(replay_config["source"]),
+        latency=replay_config.get("latency_ms", 0) / 1000,
+        jitter=replay_config.get("jitter_ms", 0) / 1000,
+        flood_wait_rate=replay_config.get("flood_wait_rate", 0.0),
+        flood_wait_seconds=replay_config.get("flood_wait_seconds", 1),
+        disconnect_rate=replay_config.get("disconnect_rate", 0.0),
+        page_size=replay_config.get("page_size", 100),
+        seed=replay_config.get("seed", 0),
+    )
+
+
+def print_stats(client):
+    print(f"Replay: {client.requests} requests, {client.messages_served} messages served, "
+          f"{client.flood_waits} flood waits, {client.disconnects} disconnects")
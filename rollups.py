@@ -0,0 +1,261 @@
+import time
+from datetime import datetime, timezone
+
+import message_parser
+import message_store
+import parallel
+from aggregation import TOP_N, format_avg_time_diff
+from instrumentation import stats
+from message_parser import METRICS
+from message_store import HOUR, ROLLUP_COLUMNS
+
+# Views and forwards get top-N candidates per hour like the metrics, for the Top Views & Forwards tables
+TOP_COLUMNS = METRICS + ("Views", "Forwards")
+
+
+def summarize(messages):
+    """Rolls messages up into per-hour rows keyed by (hour, token, chart, x.com link).
+
+    Returns (rollup_rows, top_rows): rollup_rows are dicts keyed by ROLLUP_COLUMNS and top_rows
+    are (hour, metric, message_id, value) candidates, the TOP_N largest per hour and metric.
+    """
+    groups = {}
+    candidates = {}
+    parse_seconds = 0.0
+    for message in messages:
+        timestamp = message_store.to_timestamp(message.date)
+        hour = timestamp // HOUR * HOUR
+        parse_started = time.perf_counter()
+        parsed = message_parser.parse_message(message.message, message.urls)
+        parse_seconds += time.perf_counter() - parse_started
+
+        candidates.setdefault((hour, "Views"), []).append((message.views or 0, message.id))
+        candidates.setdefault((hour, "Forwards"), []).append((message.forwards or 0, message.id))
+        if not parsed.chart_url:
+            continue
+
+        key = (hour, parsed.token_name, parsed.chart_url, parsed.x_com_link)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = dict.fromkeys(ROLLUP_COLUMNS)
+            group.update(hour=hour, token_name=parsed.token_name, url=parsed.chart_url, x_com_link=parsed.x_com_link,
+                         occurrences=0, first_id=message.id, first_seen=timestamp, last_seen=timestamp)
+            for metric in METRICS:
+                group[f"{metric.lower()}_count"] = group[f"{metric.lower()}_sum"] = 0
+        group["occurrences"] += 1
+        group["first_id"] = min(group["first_id"], message.id)
+        group["first_seen"] = min(group["first_seen"], timestamp)
+        group["last_seen"] = max(group["last_seen"], timestamp)
+
+        for metric in METRICS:
+            reading = parsed.metrics.get(metric)
+            candidates.setdefault((hour, metric), []).append((reading.value if reading is not None else 0, message.id))
+            if reading is None:
+                continue
+            prefix = metric.lower()
+            group[f"{prefix}_count"] += 1
+            group[f"{prefix}_sum"] += reading.value
+            if group[f"{prefix}_max"] is None or reading.value > group[f"{prefix}_max"]:
+                group[f"{prefix}_max"] = reading.value
+            if group[f"{prefix}_first_id"] is None or message.id < group[f"{prefix}_first_id"]:
+                group[f"{prefix}_first_id"] = message.id
+            # The largest disparity is dated at the first message (by id) that reached it
+            if (group[f"{prefix}_disparity_max"] is None or reading.disparity > group[f"{prefix}_disparity_max"]
+                    or (reading.disparity == group[f"{prefix}_disparity_max"] and message.id < group[f"{prefix}_disparity_id"])):
+                group[f"{prefix}_disparity_max"] = reading.disparity
+                group[f"{prefix}_disparity_id"] = message.id
+                group[f"{prefix}_disparity_at"] = timestamp
+
+    stats.record("parse", parse_seconds)
+    stats.count("messages_parsed", len(messages))
+
+    top_rows = []
+    for (hour, metric), values in candidates.items():
+        values.sort(key=lambda candidate: (-candidate[0], candidate[1]))
+        top_rows.extend((hour, metric, message_id, value) for value, message_id in values[:TOP_N])
+    return list(groups.values()), top_rows
+
+
+def save_hour(conn, hour, rollup_rows, top_rows):
+    placeholders = ", ".join("?" * len(ROLLUP_COLUMNS))
+    with conn:
+        conn.execute("DELETE FROM hourly_rollups WHERE hour = ?", (hour,))
+        conn.execute("DELETE FROM hourly_top WHERE hour = ?", (hour,))
+        conn.executemany(
+            f"INSERT INTO hourly_rollups ({', '.join(ROLLUP_COLUMNS)}) VALUES ({placeholders})",
+            [[row[column] for column in ROLLUP_COLUMNS] for row in rollup_rows],
+        )
+        conn.executemany("INSERT INTO hourly_top (hour, metric, message_id, value) VALUES (?, ?, ?, ?)", top_rows)
+        conn.execute("DELETE FROM dirty_hours WHERE hour = ?", (hour,))
+
+
+def refresh_rollups(conn, workers=0, before=None):
+    """Recomputes the rollups for every hour new or updated messages landed in (only those before the timestamp before, if given).
+
+    Each hour is summarized on its own, so a large backlog of hours (a long backfill) is
+    summarized on a process pool, a batch of hours at a time to bound memory.
+    """
+    if before is None:
+        hours = [hour for (hour,) in conn.execute("SELECT hour FROM dirty_hours ORDER BY hour")]
+    else:
+        hours = [hour for (hour,) in conn.execute("SELECT hour FROM dirty_hours WHERE hour < ? ORDER BY hour", (before,))]
+    if not hours:
+        return 0
+    (pending,) = conn.execute("SELECT COUNT(*) FROM messages WHERE date >= ? AND date < ?", (hours[0], hours[-1] + HOUR)).fetchone()
+
+    if not parallel.use_pool(pending, workers):
+        for hour in hours:
+            summary = summarize(message_store.load_messages_between(conn, hour, hour + HOUR))
+            with stats.stage("store"):
+                save_hour(conn, hour, *summary)
+        return len(hours)
+
+    with parallel.process_pool(workers) as pool:
+        batch_size = parallel.worker_count(workers) * 32
+        for i in range(0, len(hours), batch_size):
+            batch = hours[i:i + batch_size]
+            with stats.stage("store"):
+                hour_messages = [message_store.load_messages_between(conn, hour, hour + HOUR) for hour in batch]
+            # The parse happens in the workers, so it is timed here rather than inside summarize
+            with stats.stage("parse"):
+                summaries = list(pool.map(summarize, hour_messages, chunksize=8))
+            with stats.stage("store"):
+                for hour, summary in zip(batch, summaries):
+                    save_hour(conn, hour, *summary)
+            stats.count("messages_parsed", sum(len(messages) for messages in hour_messages))
+    return len(hours)
+
+
+def load_window(conn, start_ts, end_ts):
+    """Rollup and top-N rows covering [start_ts, end_ts).
+
+    Whole hours come from the stored rollups; the partial hours at either edge are
+    summarized from their raw messages.
+    """
+    first_full_hour = -(-start_ts // HOUR) * HOUR
+    last_full_hour = end_ts // HOUR * HOUR
+    if first_full_hour >= last_full_hour:
+        return summarize(message_store.load_messages_between(conn, start_ts, end_ts))
+
+    rollup_rows = [
+        dict(zip(ROLLUP_COLUMNS, row)) for row in conn.execute(
+            f"SELECT {', '.join(ROLLUP_COLUMNS)} FROM hourly_rollups WHERE hour >= ? AND hour < ?", (first_full_hour, last_full_hour)
+        )
+    ]
+    top_rows = conn.execute(
+        "SELECT hour, metric, message_id, value FROM hourly_top WHERE hour >= ? AND hour < ?", (first_full_hour, last_full_hour)
+    ).fetchall()
+    for edge_start, edge_end in ((start_ts, first_full_hour), (last_full_hour, end_ts)):
+        if edge_start < edge_end:
+            edge_rollups, edge_top = summarize(message_store.load_messages_between(conn, edge_start, edge_end))
+            rollup_rows.extend(edge_rollups)
+            top_rows.extend(edge_top)
+    return rollup_rows, top_rows
+
+
+def report_tables_from_rollups(conn, start_date, end_date, format_date, workers=0):
+    """Builds the same tables as aggregation.compute_report_tables by merging hourly rollups.
+
+    Only the dirty hours and the window's partial edge hours touch raw messages.
+    """
+    import pandas as pd
+
+    refresh_rollups(conn, workers)
+    # load_messages treats end_date as inclusive to the second
+    rollup_rows, top_rows = load_window(conn, int(start_date.timestamp()), int(end_date.timestamp()) + 1)
+
+    rollups = pd.DataFrame(rollup_rows, columns=ROLLUP_COLUMNS)
+    top = pd.DataFrame(top_rows, columns=["hour", "metric", "message_id", "value"])
+
+    top_ids = {metric: _top_ids(top, metric) for metric in TOP_COLUMNS}
+    details = {message.id: message for message in message_store.load_messages_by_id(conn, sorted(set().union(*top_ids.values())))}
+
+    return {
+        "most_recurring_charts": _most_recurring_charts(rollups),
+        "disparity_tables": {metric: _disparity_table(rollups, metric, format_date) for metric in METRICS},
+        "metrics_tables": {metric: _metric_table(top, top_ids[metric], details, metric, format_date) for metric in METRICS},
+        "top_views": _top_messages_frame(top_ids["Views"], details),
+        "top_forwards": _top_messages_frame(top_ids["Forwards"], details),
+    }
+
+
+def _top_ids(top, metric):
+    candidates = top[top["metric"] == metric].sort_values(["value", "message_id"], ascending=[False, True])
+    return list(candidates["message_id"].head(TOP_N))
+
+
+def _most_recurring_charts(rollups):
+    keys = ["token_name", "url"]
+    if rollups.empty:
+        return []
+    summary = rollups.groupby(keys).agg(
+        count=("occurrences", "sum"), first_id=("first_id", "min"), first=("first_seen", "min"), last=("last_seen", "max")
+    )
+    # Counter.most_common order: by count, ties in order of first appearance
+    summary = summary.sort_values("first_id").sort_values("count", ascending=False, kind="stable").head(TOP_N)
+
+    # Averages count only the x.com groups with at least one Likes reading, as process_messages did
+    detailed = rollups.groupby(keys + ["x_com_link"]).sum(numeric_only=True)
+    detailed = detailed[detailed["likes_count"] > 0].groupby(level=keys).sum()
+
+    rows = []
+    for (token_name, chart_href), count, first, last in summary[["count", "first", "last"]].itertuples():
+        avg_time_diff_str = format_avg_time_diff((last - first) / (count - 1)) if count >= 2 else "N/A"
+        totals = detailed.loc[(token_name, chart_href)] if (token_name, chart_href) in detailed.index else None
+        averages = []
+        for metric in METRICS:
+            prefix = metric.lower()
+            if totals is not None and totals[f"{prefix}_count"]:
+                averages.append(totals[f"{prefix}_sum"] / totals[f"{prefix}_count"])
+            else:
+                averages.append(0)
+        rows.append((token_name, chart_href, int(count), avg_time_diff_str) + tuple(f"{average:.2f}" for average in averages))
+    return rows
+
+
+def _disparity_table(rollups, metric, format_date):
+    prefix = metric.lower()
+    readings = rollups[rollups[f"{prefix}_count"] > 0]
+    if readings.empty:
+        return []
+    keys = ["token_name", "url", "x_com_link"]
+    # Per group: the largest disparity, from the earliest message that reached it
+    readings = readings.sort_values([f"{prefix}_disparity_max", f"{prefix}_disparity_id"], ascending=[False, True], kind="stable")
+    peaks = readings.groupby(keys, sort=False).head(1)
+    first_ids = readings.groupby(keys)[f"{prefix}_first_id"].min()
+    peaks = peaks.assign(group_first_id=[first_ids[key] for key in peaks[keys].itertuples(index=False, name=None)])
+    peaks = peaks.sort_values("group_first_id").sort_values(f"{prefix}_disparity_max", ascending=False, kind="stable").head(TOP_N)
+    return [
+        (token_name, chart_href, x_com_link, int(disparity), format_date(datetime.fromtimestamp(disparity_at, timezone.utc)))
+        for token_name, chart_href, x_com_link, disparity, disparity_at
+        in peaks[keys + [f"{prefix}_disparity_max", f"{prefix}_disparity_at"]].itertuples(index=False)
+    ]
+
+
+def _metric_table(top, message_ids, details, metric, format_date):
+    values = dict(zip(top.loc[top["metric"] == metric, "message_id"], top.loc[top["metric"] == metric, "value"]))
+    rows = []
+    for message_id in message_ids:
+        message = details[message_id]
+        parsed = message_parser.parse_message(message.message, message.urls)
+        rows.append((parsed.token_name, metric, int(values[message_id]), format_date(message.date), parsed.chart_url, parsed.x_com_link))
+    return rows
+
+
+def _top_messages_frame(message_ids, details):
+    import pandas as pd
+
+    rows = []
+    for message_id in message_ids:
+        message = details[message_id]
+        parsed = message_parser.parse_message(message.message, message.urls)
+        rows.append({
+            "date": message.date,
+            "token_name": parsed.token_name,
+            "message_text": parsed.message_text,
+            "url": parsed.chart_url,
+            "x_com_link": parsed.x_com_link,
+            "views": message.views or 0,
+            "forwards": message.forwards or 0,
+        })
+    return pd.DataFrame(rows, columns=["date", "token_name", "message_text", "url", "x_com_link", "views", "forwards"])
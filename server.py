@@ -0,0 +1,203 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import channels
+import exporters
+import message_store
+import rollups
+import trending
+import watchlist
+
+REPORT_CACHE_SIZE = 32
+
+
+class QueryService:
+    """Answers token searches and reports from the channel stores, keeping the results hot.
+
+    conns maps channel names to open message stores. Cached token ranks, reports and searches
+    are keyed on each store's PRAGMA data_version, which moves whenever another process (a
+    fetch or a cron batch run) commits to it, so answers are never stale and repeated queries
+    never touch SQLite or pandas again.
+    """
+
+    def __init__(self, conns, token_tables, format_date, local_tz, workers=0):
+        self.conns = conns
+        self.token_tables = token_tables
+        self.format_date = format_date
+        self.local_tz = local_tz
+        self.workers = workers
+        self.lock = threading.Lock()  # One query at a time on the shared connections and caches
+        self.token_ranks = {}
+        self.trending_tokens = {}
+        self.texts = {}  # Channel name -> (data version, watchlist.searchable_texts)
+        self.cache = OrderedDict()
+
+    def data_versions(self, names):
+        return tuple(self.conns[name].execute("PRAGMA data_version").fetchone()[0] for name in names)
+
+    def cached(self, key, build):
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        value = self.cache[key] = build()
+        if len(self.cache) > REPORT_CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return value
+
+    def ranks(self, names):
+        key = (names, self.data_versions(names))
+        if key not in self.token_ranks:
+            conns = {name: self.conns[name] for name in names}
+            ranks = message_store.load_token_ranks(conns[names[0]]) if len(names) == 1 else channels.merged_token_ranks(conns)
+            self.token_ranks = {key: ranks}  # Only the current version is ever asked for again
+        return self.token_ranks[key]
+
+    def searchable_texts(self, name):
+        # Read once per data version, so a search the index can't answer scans memory rather than the store
+        version = self.data_versions((name,))
+        if self.texts.get(name, (None,))[0] != version:
+            self.texts[name] = (version, watchlist.searchable_texts(self.conns[name]))
+        return self.texts[name][1]
+
+    def channel_names(self, requested):
+        unknown = [name for name in requested if name not in self.conns]
+        if unknown:
+            raise ValueError(f"unknown channel(s): {', '.join(unknown)}")
+        return tuple(requested or self.conns)
+
+    def search(self, terms, requested_channels=()):
+        with self.lock:
+            names = self.channel_names(requested_channels)
+            key = ("search", tuple(terms), names, self.data_versions(names))
+            return self.cached(key, lambda: self.build_search(terms, names))
+
+    def build_search(self, terms, names):
+        conns = {name: self.conns[name] for name in names}
+        token_ranks = self.ranks(names)
+        results = {}
+        texts = {name: self.searchable_texts(name) for name in names}
+        for term, messages_by_channel in channels.search_channels(conns, terms, texts).items():
+            messages = sorted((message for messages in messages_by_channel.values() for message in messages), key=lambda message: message.date)
+            chart_rows, x_com_rows = self.token_tables(term, messages, token_ranks)
+            result = {
+                "charts": {"headers": exporters.TOKEN_CHART_HEADERS, "rows": chart_rows},
+                "recent_x_com": {"headers": exporters.X_COM_HEADERS, "rows": x_com_rows},
+            }
+            if len(conns) > 1:
+                result["first_seen"] = {"headers": ["Channel", "First Seen", "Posts"], "rows": channels.first_seen_rows(messages_by_channel, self.format_date)}
+            results[term] = result
+        return results
+
+    def report(self, start_date, end_date, requested_channels=()):
+        with self.lock:
+            names = self.channel_names(requested_channels)
+            key = ("report", start_date, end_date, names, self.data_versions(names))
+            return self.cached(key, lambda: self.build_report(start_date, end_date, names))
+
+    def build_report(self, start_date, end_date, names):
+        # No end means up to now; with the data version unchanged nothing newer exists, so the cached report still holds
+        end_date = end_date or datetime.now(self.local_tz)
+        if len(names) == 1:
+            report_tables = rollups.report_tables_from_rollups(self.conns[names[0]], start_date, end_date, self.format_date, self.workers)
+        else:
+            conns = {name: self.conns[name] for name in names}
+            report_tables = channels.merged_report_tables(conns, start_date, end_date, self.format_date, self.workers)
+        # The same sheets and tables the saved reports have
+        return {
+            "start": self.format_date(start_date),
+            "end": self.format_date(end_date),
+            "sheets": [
+                {"name": sheet.name, "tables": [{"name": name, "headers": headers, "rows": rows} for name, headers, rows in sheet.tables]}
+                for sheet in exporters.report_sheets(report_tables, self.format_date)
+            ],
+        }
+
+    def trending(self, window, by, limit, requested_channels=()):
+        with self.lock:
+            names = self.channel_names(requested_channels)
+            key = (names, self.data_versions(names))
+            if key not in self.trending_tokens:
+                conns = {name: self.conns[name] for name in names}
+                self.trending_tokens = {key: trending.trending_from_stores(conns, time.time())}
+            # The counters are kept rather than the rows, so the ranking follows the clock between writes
+            rows = self.trending_tokens[key].ranking(window, by, limit, time.time())
+            return {"window": window, "by": by, "headers": trending.TRENDING_HEADERS, "rows": rows}
+
+    def health(self):
+        with self.lock:
+            return {name: {"messages": message_store.count_messages(conn)} for name, conn in self.conns.items()}
+
+    def report_range(self, query):
+        """The report window from ?start=YYYY-MM-DD&end=YYYY-MM-DD, like the batch mode's --start/--end; no end means now."""
+        today = datetime.now(self.local_tz).replace(hour=0, minute=0, second=0, microsecond=0)
+        start_date = self.local_tz.localize(datetime.strptime(query["start"][0], "%Y-%m-%d")) if "start" in query else today
+        end_date = None
+        if "end" in query:
+            end_date = self.local_tz.localize(datetime.strptime(query["end"][0], "%Y-%m-%d") + timedelta(days=1)) - timedelta(seconds=1)
+        return start_date, end_date
+
+
+def json_value(value):
+    # Numbers from the pandas-built tables arrive as numpy scalars
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def make_handler(service):
+    class QueryHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            requested_channels = query.get("channel", [])
+            try:
+                if url.path == "/search":
+                    terms = [term.strip() for term in query.get("term", []) if term.strip()]
+                    if not terms:
+                        raise ValueError("give at least one ?term=")
+                    self.respond(200, service.search(terms, requested_channels))
+                elif url.path == "/report":
+                    start_date, end_date = service.report_range(query)
+                    self.respond(200, service.report(start_date, end_date, requested_channels))
+                elif url.path == "/trending":
+                    limit = int(query.get("limit", ["10"])[0])
+                    self.respond(200, service.trending(query.get("window", ["1h"])[0], query.get("by", ["acceleration"])[0], limit, requested_channels))
+                elif url.path == "/health":
+                    self.respond(200, service.health())
+                else:
+                    self.respond(404, {"error": "unknown path, use /search?term=CA, /report?start=YYYY-MM-DD&end=YYYY-MM-DD, /trending?window=1h&by=acceleration or /health"})
+            except ValueError as e:
+                self.respond(400, {"error": str(e)})
+
+        def respond(self, status, body):
+            data = json.dumps(body, ensure_ascii=False, default=json_value).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # Keep the console for the startup line and errors
+
+    return QueryHandler
+
+
+def serve(service, host, port):
+    try:
+        httpd = ThreadingHTTPServer((host, port), make_handler(service))
+    except OSError as e:
+        print(f"Unable to listen on {host}:{port}: {e}")
+        return
+    print(f"Answering queries on http://{host}:{port} (/search?term=CA, /report?start=YYYY-MM-DD, /trending?window=1h, /health). Press Ctrl+C to stop.")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped serving.")
+    finally:
+        httpd.server_close()
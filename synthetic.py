@@ -0,0 +1,116 @@
+import random
+import string
+from datetime import datetime, timedelta, timezone
+
+from message_store import MessageRecord
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+# How raidboard names the token on the first line, one per TOKEN_NAME_PATTERNS style
+TOKEN_LINES = (
+    "{token} Started a raid on X",
+    "{token} Just got shilled",
+    "🚀 {token} 🚀",
+    "Token: {token}",
+    "Launching {token} now",
+    "New Shill: {token}",
+)
+ANNOUNCEMENTS = (
+    "Raid leaderboard resets in 1 hour",
+    "Maintenance tonight, raids paused for 10 minutes",
+    "New raid rules are pinned, read them before posting",
+)
+
+
+def random_base58(rng, length):
+    return "".join(rng.choice(BASE58_ALPHABET) for _ in range(length))
+
+
+def random_hex_address(rng):
+    return "0x" + "".join(rng.choice("0123456789abcdef") for _ in range(40))
+
+
+class Token:
+    """A shilled token: its chart, contract address and the tweets being raided, whose metrics only grow."""
+
+    __slots__ = ("name", "chain", "address", "pair", "tweets")
+
+    def __init__(self, rng, index):
+        self.name = "".join(rng.choice(string.ascii_uppercase) for _ in range(rng.randint(3, 6))) + str(index)
+        if rng.random() < 0.7:
+            self.chain = "solana"
+            self.address = random_base58(rng, 44)
+            self.pair = random_base58(rng, 44)
+        else:
+            self.chain = rng.choice(("ethereum", "base"))
+            self.address = random_hex_address(rng)
+            self.pair = random_hex_address(rng)
+        self.tweets = []
+
+    def tweet(self, rng):
+        # Mostly re-raids of an existing tweet, sometimes a fresh one
+        if not self.tweets or rng.random() < 0.15:
+            status_id = rng.randint(10 ** 18, 2 * 10 ** 18)
+            user = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12)))
+            self.tweets.append([f"https://x.com/{user}/status/{status_id}", {"Likes": 0, "Retweets": 0, "Replies": 0, "Bookmarks": 0}])
+        return rng.choice(self.tweets)
+
+
+def metric_line(emoji, metric, metrics, rng, growth):
+    delta = int(rng.expovariate(1 / growth))
+    metrics[metric] += delta
+    return f"{emoji} {metric}: {metrics[metric]} (+{delta})"
+
+
+def iter_records(count, seed=0, start=None, token_count=None, mean_gap_seconds=20):
+    """Yields count raidboard-style MessageRecords, oldest first, reproducible for a given seed.
+
+    Token popularity is Zipf-like, tweets get raided repeatedly with growing metrics, some
+    posts miss metric lines or carry the contract address in the text, and about one post
+    in twenty is an announcement without a chart.
+    """
+    rng = random.Random(seed)
+    date = start or datetime(2024, 1, 1, tzinfo=timezone.utc)
+    token_count = token_count or max(20, count // 200)
+    tokens = [Token(rng, index) for index in range(token_count)]
+    weights = [1 / (rank + 1) for rank in range(token_count)]
+
+    for message_id in range(1, count + 1):
+        date += timedelta(seconds=max(1, int(rng.expovariate(1 / mean_gap_seconds))))
+        views = int(rng.lognormvariate(7, 1))
+        forwards = int(views * rng.random() * 0.01)
+        header = f"🐬 | D.RAIDBOARD #{message_id} | {rng.randint(1, 9)}⚡️"
+
+        if rng.random() < 0.05:
+            yield MessageRecord(message_id, date, f"{header}\n{rng.choice(ANNOUNCEMENTS)}", (), views, forwards)
+            continue
+
+        token = rng.choices(tokens, weights)[0]
+        x_com_link, metrics = token.tweet(rng)
+        lines = [header, rng.choice(TOKEN_LINES).format(token=token.name)]
+        if rng.random() < 0.2:
+            lines.append(f"CA: {token.address}")
+        for emoji, metric, growth in (("❤️", "Likes", 40), ("🔄", "Retweets", 8), ("💬", "Replies", 4), ("🔖", "Bookmarks", 2)):
+            if rng.random() < 0.93:
+                lines.append(metric_line(emoji, metric, metrics, rng, growth))
+        lines.append("📈 Chart   ⏫ Trending   ✳️ Events")
+
+        urls = (f"https://dexscreener.com/{token.chain}/{token.pair}", x_com_link)
+        yield MessageRecord(message_id, date, "\n".join(lines), urls, views, forwards)
+
+
+def generate_records(count, seed=0, start=None):
+    return list(iter_records(count, seed=seed, start=start))
+
+
+def to_dict(record):
+    """The record as Telethon's message.to_dict() shape that MessageRecord.from_dict and the JSON history use."""
+    return {
+        "_": "Message",
+        "id": record.id,
+        "date": record.date.isoformat(),
+        "message": record.message,
+        "entities": [{"_": "MessageEntityTextUrl", "offset": 0, "length": 1, "url": url} for url in record.urls],
+        "views": record.views,
+        "forwards": record.forwards,
+    }
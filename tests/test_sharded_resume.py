@@ -0,0 +1,92 @@
+"""An interrupted sharded backfill resumes after its last fully stored shard.
+
+    python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from datetime import timedelta
+
+REPO_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIRECTORY)
+
+import main  # noqa: E402
+import message_store  # noqa: E402
+import replay  # noqa: E402
+import synthetic  # noqa: E402
+
+SHARDS = 4
+
+
+class RecordingReplayClient(replay.ReplayClient):
+    """Logs every page request; requests starting at or after hang_from never return, like a stalled connection."""
+
+    def __init__(self, records, hang_from=None):
+        super().__init__(records)
+        self.hang_from = hang_from
+        self.page_requests = []
+
+    async def get_messages(self, entity, limit=1, reverse=False, offset_date=None, min_id=0, max_id=0):
+        self.page_requests.append((offset_date, min_id))
+        if self.hang_from is not None and offset_date is not None and offset_date >= self.hang_from:
+            await asyncio.Event().wait()
+        return await super().get_messages(entity, limit, reverse, offset_date, min_id, max_id)
+
+
+class ShardedResumeTest(unittest.TestCase):
+    def setUp(self):
+        main.load_config(os.path.join(REPO_DIRECTORY, "config.json"))
+        self.work_directory = tempfile.TemporaryDirectory()
+        self.conn = message_store.open_store(os.path.join(self.work_directory.name, "resume.db"))
+        self.records = synthetic.generate_records(3000, seed=4)
+        self.start_date = self.records[0].date
+        main.end_date = self.records[-1].date
+        main.fetch_shards = SHARDS
+        main.dataset_directory = ""
+
+    def tearDown(self):
+        self.conn.close()
+        self.work_directory.cleanup()
+
+    def interrupted_fetch(self, client):
+        """Runs the fetch until the first shards are checkpointed, then cancels it like Ctrl+C would."""
+        async def run():
+            await client.start()
+            fetch = asyncio.create_task(main.fetch_new_messages(client, "replay", self.start_date, self.conn))
+            for _ in range(1000):
+                await asyncio.sleep(0.01)
+                if message_store.load_fetch_state(self.conn).get("last_message_id") == self.last_before_hang.id:
+                    break
+            fetch.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await fetch
+
+        asyncio.run(run())
+
+    def test_resumes_after_the_finished_shards(self):
+        shard_ranges = main.split_date_range(self.start_date, main.end_date + timedelta(microseconds=1), SHARDS)
+        # The last shard's first page is requested a second before its start
+        hang_from = shard_ranges[-1][0] - timedelta(seconds=1)
+        self.last_before_hang = [record for record in self.records if record.date < shard_ranges[-1][0]][-1]
+
+        self.interrupted_fetch(RecordingReplayClient(self.records, hang_from))
+        state = message_store.load_fetch_state(self.conn)
+        self.assertEqual(state["last_message_id"], self.last_before_hang.id)
+        self.assertEqual(state["covered_from"], self.start_date.isoformat())
+
+        client = RecordingReplayClient(self.records)
+        asyncio.run(client.start())
+        asyncio.run(main.fetch_new_messages(client, "replay", self.start_date, self.conn))
+
+        # Only the messages after the checkpoint were asked for and served again
+        self.assertTrue(all(min_id >= self.last_before_hang.id for _, min_id in client.page_requests))
+        missing = [record for record in self.records if record.id > self.last_before_hang.id]
+        self.assertEqual(client.messages_served, len(missing))
+        self.assertEqual(message_store.count_messages(self.conn), len(self.records))
+        self.assertEqual(message_store.load_fetch_state(self.conn)["last_message_id"], self.records[-1].id)
+
+
+if __name__ == "__main__":
+    unittest.main()
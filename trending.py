@@ -0,0 +1,154 @@
+import heapq
+
+import message_parser
+import message_store
+
+# (name, length in seconds, buckets per window): the windows are approximated to a bucket's width
+WINDOWS = (("5m", 300, 10), ("1h", 3600, 12), ("24h", 86400, 24))
+TRENDING_HEADERS = ["Token", "📈 Chart Link", "Shills/h 5m", "Shills/h 1h", "Shills/h 24h", "Acceleration"]
+
+
+class WindowCounter:
+    """Shill counts for the last window and the window before it, in a ring of 2 x buckets buckets.
+
+    The ring only moves forward. Each step moves one bucket from the current window into the
+    previous one and reuses the oldest, so both sums stay exact without rescanning the ring.
+    """
+
+    __slots__ = ("width", "buckets", "counts", "head", "head_number", "current", "previous")
+
+    def __init__(self, window_seconds, buckets):
+        self.width = window_seconds // buckets
+        self.buckets = buckets
+        self.counts = [0] * (2 * buckets)
+        self.head = 0  # Ring index of the newest bucket
+        self.head_number = None  # Which bucket of time (timestamp // width) the newest bucket holds
+        self.current = 0
+        self.previous = 0
+
+    def advance(self, timestamp):
+        number = int(timestamp // self.width)
+        if self.head_number is None:
+            self.head_number = number
+            return
+        steps = number - self.head_number
+        if steps <= 0:
+            return
+        size = 2 * self.buckets
+        if steps >= size:
+            # Quiet for two whole windows, nothing left to count
+            self.counts = [0] * size
+            self.current = self.previous = 0
+        else:
+            for _ in range(steps):
+                self.head = (self.head + 1) % size
+                self.previous -= self.counts[self.head]  # The oldest bucket falls out of both windows
+                self.counts[self.head] = 0
+                moving = self.counts[(self.head - self.buckets) % size]
+                self.current -= moving
+                self.previous += moving
+        self.head_number = number
+
+    def add(self, timestamp):
+        self.advance(timestamp)
+        # A post older than the newest bucket (e.g. a late edit) still lands in its own bucket
+        offset = self.head_number - int(timestamp // self.width)
+        if offset >= 2 * self.buckets:
+            return
+        self.counts[(self.head - offset) % (2 * self.buckets)] += 1
+        if offset < self.buckets:
+            self.current += 1
+        else:
+            self.previous += 1
+
+
+class TrendingTokens:
+    """Which (token, chart) pairs are being shilled fastest right now, and which are speeding up.
+
+    add() is constant time per post: one bucket increment per window. Velocity is shills per
+    hour over a window; acceleration is how much that velocity rose against the window before
+    it. Rankings only visit the tokens shilled within the last two windows, and tokens quiet
+    for two of the longest windows are forgotten, so memory stays bounded on a live feed.
+    """
+
+    def __init__(self, windows=WINDOWS):
+        self.windows = windows
+        self.counters = {}  # (token, chart) -> a WindowCounter per window
+        self.active = [set() for _ in windows]  # Per window, the keys that may still have counts in it
+        self.latest = 0  # Newest post time seen, the "now" for rankings over stored history
+
+    def add(self, key, timestamp):
+        counters = self.counters.get(key)
+        if counters is None:
+            counters = self.counters[key] = [WindowCounter(seconds, buckets) for _, seconds, buckets in self.windows]
+        for counter, active in zip(counters, self.active):
+            counter.add(timestamp)
+            active.add(key)
+        self.latest = max(self.latest, timestamp)
+
+    def add_message(self, message):
+        if message.date is None:
+            return
+        parsed = message_parser.parse_message(message.message, message.urls)
+        if parsed.chart_url:
+            self.add((parsed.token_name, parsed.chart_url), message.date.timestamp())
+
+    def window_index(self, window):
+        for i, (name, _, _) in enumerate(self.windows):
+            if name == window:
+                return i
+        raise ValueError(f"unknown window {window!r}, use one of {', '.join(name for name, _, _ in self.windows)}")
+
+    def velocities(self, counters, now):
+        rates = []
+        for counter, (_, seconds, _) in zip(counters, self.windows):
+            counter.advance(now)
+            rates.append((counter.current * 3600 / seconds, counter.previous * 3600 / seconds))
+        return rates
+
+    def ranking(self, window="1h", by="acceleration", limit=10, now=None):
+        """The top rows of (token, chart, shills/h per window..., acceleration in window), by velocity or acceleration in window."""
+        if by not in ("velocity", "acceleration"):
+            raise ValueError("rank by velocity or acceleration")
+        index = self.window_index(window)
+        now = now if now is not None else self.latest
+        candidates = []
+        for key in list(self.active[index]):
+            counters = self.counters[key]
+            rates = self.velocities(counters, now)
+            current, previous = rates[index]
+            if not current and not previous:
+                self.forget(key, index)
+                continue
+            row = key + tuple(round(rate, 2) for rate, _ in rates) + (round(current - previous, 2),)
+            candidates.append((current if by == "velocity" else current - previous, current, row))
+        return [row for _, _, row in heapq.nlargest(limit, candidates, key=lambda candidate: candidate[:2])]
+
+    def forget(self, key, index):
+        self.active[index].discard(key)
+        if not any(key in active for active in self.active):
+            del self.counters[key]
+
+
+def trending_tables(trending, by="acceleration", limit=10, now=None):
+    """{window name: ranking rows} for every window."""
+    return {name: trending.ranking(name, by, limit, now) for name, _, _ in trending.windows}
+
+
+def trending_from_stores(conns, now):
+    """A TrendingTokens holding the posts from the two longest windows before now, over every channel's store."""
+    trending = TrendingTokens()
+    since = int(now) - 2 * max(seconds for _, seconds, _ in trending.windows)
+    messages = [message for conn in conns.values() for message in message_store.load_messages_between(conn, since, int(now) + 1)]
+    for message in sorted(messages, key=lambda message: message.date):
+        trending.add_message(message)
+    return trending
+
+
+def print_trending(tables, by="acceleration"):
+    from tabulate import tabulate
+
+    for window, rows in tables.items():
+        if rows:
+            print(f"\nHeating up over the last {window} (by {by})")
+            print(tabulate(rows, TRENDING_HEADERS, tablefmt="fancy_grid"))
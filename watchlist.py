@@ -0,0 +1,153 @@
+from bisect import bisect_right
+from collections import deque
+
+import message_store
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: finds every pattern in a text in one pass over it.
+
+    Patterns are matched case-insensitively, like search_token_in_message does for a
+    single token.
+    """
+
+    def __init__(self, patterns):
+        # One dict of transitions per state; state 0 is the root
+        self.transitions = [{}]
+        self.fail = [0]
+        self.outputs = [set()]
+        for pattern in patterns:
+            self.add(pattern.lower())
+        self.link()
+
+    def add(self, pattern):
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self.transitions[state].get(char)
+            if next_state is None:
+                next_state = len(self.transitions)
+                self.transitions.append({})
+                self.fail.append(0)
+                self.outputs.append(set())
+                self.transitions[state][char] = next_state
+            state = next_state
+        self.outputs[state].add(pattern)
+
+    def link(self):
+        # Breadth-first, so every fail target is finished before it is followed
+        queue = deque(self.transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.transitions[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.transitions[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.transitions[fallback].get(char, 0)
+                self.outputs[next_state] |= self.outputs[self.fail[next_state]]
+
+    def find_all(self, text):
+        """Returns the set of (lowercased) patterns that occur in text."""
+        return self.find_all_lowered(text.lower())
+
+    def find_all_lowered(self, text):
+        transitions, fail, outputs = self.transitions, self.fail, self.outputs
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in transitions[state]:
+                state = fail[state]
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                found |= outputs[state]
+        return found
+
+
+def read_watchlist(path):
+    """Reads one CA or ticker per line, skipping blank lines, # comments and repeats."""
+    terms = []
+    seen = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            term = line.split("#", 1)[0].strip()
+            if term and term.lower() not in seen:
+                seen.add(term.lower())
+                terms.append(term)
+    return terms
+
+
+# Up to this many unindexed terms, str.find over the whole text is faster than one automaton pass
+FIND_MAX_TERMS = 32
+
+
+class SearchableTexts:
+    """Every stored message's text and entity URLs, lowercased into one string, and where each message starts.
+
+    The parts are joined with newlines, which a search term can't contain, so no match spans two of them.
+    """
+
+    __slots__ = ("ids", "starts", "text")
+
+    def __init__(self, messages):
+        self.ids = []
+        self.starts = []
+        parts = []
+        offset = 0
+        for message in messages:
+            part = "\n".join((message.message,) + message.urls).lower() + "\n"
+            self.ids.append(message.id)
+            self.starts.append(offset)
+            parts.append(part)
+            offset += len(part)
+        self.text = "".join(parts)
+
+    def find(self, term):
+        """The ids of the messages containing the lowercased term, in store order."""
+        ids = []
+        text, starts = self.text, self.starts
+        position = text.find(term)
+        while position != -1:
+            row = bisect_right(starts, position) - 1
+            ids.append(self.ids[row])
+            # Carry on from the next message, each one is counted once
+            position = text.find(term, starts[row + 1]) if row + 1 < len(starts) else -1
+        return ids
+
+    def find_all(self, terms):
+        """{lowercased term: message ids} for many terms, with one automaton pass once there are enough of them."""
+        terms = {term.lower() for term in terms}
+        if len(terms) <= FIND_MAX_TERMS:
+            return {term: self.find(term) for term in terms}
+        automaton = AhoCorasick(terms)
+        found = {term: [] for term in terms}
+        for row, start in enumerate(self.starts):
+            end = self.starts[row + 1] if row + 1 < len(self.starts) else len(self.text)
+            for hit in automaton.find_all_lowered(self.text[start:end]):
+                found[hit].append(self.ids[row])
+        return found
+
+
+def searchable_texts(conn):
+    return SearchableTexts(message_store.load_messages(conn))
+
+
+def search_watchlist(conn, terms, texts=None):
+    """Finds the messages for every watchlist term, in watchlist order.
+
+    CAs, pair ids and status ids the store's token index knows are looked up there in one
+    query; tickers, names and anything else unindexed are matched against the message text
+    and entity URLs. texts is searchable_texts(conn), for callers that keep it between
+    searches; otherwise it is read from the store.
+    """
+    indexed = message_store.find_messages_for_terms(conn, terms)
+    matches = {term: indexed.get(term.lower()) for term in terms}
+
+    unindexed = [term for term, messages in matches.items() if messages is None]
+    if unindexed:
+        found = (texts if texts is not None else searchable_texts(conn)).find_all(unindexed)
+        records = {message.id: message for message in message_store.load_messages_by_id(conn, {message_id for ids in found.values() for message_id in ids})}
+        for term in unindexed:
+            matches[term] = [records[message_id] for message_id in found[term.lower()]]
+    return matches